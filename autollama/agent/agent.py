@@ -1,19 +1,28 @@
 import signal
 import sys
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
 
 from colorama import Fore, Style
 
-from autollama.app import execute_command, get_command
+from autollama.app import (
+    PATHLIKE_ARGS,
+    execute_command,
+    execute_commands,
+    get_command,
+    get_commands,
+)
 from autollama.commands.command import CommandRegistry
 from autollama.config import Config
 from autollama.config.ai_config import AIConfig
 from autollama.json_utils.json_fix_llm import fix_json_using_multiple_techniques
-from autollama.json_utils.utilities import LLM_DEFAULT_RESPONSE_FORMAT, validate_json
+from autollama.json_utils.json_stream import JSONObjectStream
+from autollama.json_utils.utilities import get_response_format, validate_json
 from autollama.llm.base import ChatSequence
 from autollama.llm.chat import chat_with_ai, create_chat_completion
 from autollama.llm.utils import count_string_tokens
 from autollama.log_cycle.log_cycle import (
+    CYCLE_PROFILE_FILE_NAME,
     FULL_MESSAGE_HISTORY_FILE_NAME,
     NEXT_ACTION_FILE_NAME,
     PROMPT_SUPERVISOR_FEEDBACK_FILE_NAME,
@@ -21,6 +30,7 @@ from autollama.log_cycle.log_cycle import (
     USER_INPUT_FILE_NAME,
     LogCycleHandler,
 )
+from autollama.log_cycle.profiler import profiler
 from autollama.logs import logger, print_assistant_thoughts
 from autollama.memory.message_history import MessageHistory
 from autollama.memory.vector import VectorMemory
@@ -82,6 +92,11 @@ class Agent:
         self.created_at = datetime.now().strftime("%Y%m%d_%H%M%S")
         self.cycle_count = 0
         self.log_cycle_handler = LogCycleHandler()
+        self._reply_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="reply-stream"
+        )
+        if cfg.profile_cycles:
+            profiler.enable()
 
     def start_interaction_loop(self):
         # Interaction Loop
@@ -108,7 +123,7 @@ class Agent:
         while True:
             # Discontinue if continuous limit is reached
             self.cycle_count += 1
-            self.log_cycle_handler.log_count_within_cycle = 0
+            profiler.start_cycle()
             self.log_cycle_handler.log_cycle(
                 self.config.ai_name,
                 self.created_at,
@@ -126,32 +141,49 @@ class Agent:
                 )
                 break
             # Send message to AI, get response
+            reply_future = None
+            commands = []
             with Spinner("Thinking... ", plain_output=cfg.plain_output):
-                assistant_reply = chat_with_ai(
-                    cfg,
-                    self,
-                    self.system_prompt,
-                    self.triggering_prompt,
-                    cfg.token_limit,
-                    cfg.llm_model,
-                )
+                if cfg.stream_responses:
+                    assistant_reply, reply_future = self._start_streamed_reply(cfg)
+                else:
+                    assistant_reply = chat_with_ai(
+                        cfg,
+                        self,
+                        self.system_prompt,
+                        self.triggering_prompt,
+                        cfg.token_limit,
+                        cfg.llm_model,
+                    )
 
-            assistant_reply_json = fix_json_using_multiple_techniques(assistant_reply)
+            with profiler.span("json_repair"):
+                assistant_reply_json = fix_json_using_multiple_techniques(
+                    assistant_reply
+                )
 
 
             # Print Assistant thoughts
             if assistant_reply_json != {}:
-                validate_json(assistant_reply_json, LLM_DEFAULT_RESPONSE_FORMAT)
+                with profiler.span("validation"):
+                    validate_json(assistant_reply_json, get_response_format())
                 # Get command name and arguments
                 try:
                     print_assistant_thoughts(
                         self.ai_name, assistant_reply_json, cfg.speak_mode
                     )
-                    command_name, arguments = get_command(assistant_reply_json)
+                    if cfg.parallel_commands:
+                        commands = get_commands(assistant_reply_json)
+                    else:
+                        commands = [get_command(assistant_reply_json)]
+                    command_name, arguments = commands[0]
                     if cfg.speak_mode:
                         say_text(f"I want to execute {command_name}")
 
-                    arguments = self._resolve_pathlike_command_args(arguments)
+                    commands = [
+                        (name, self._resolve_pathlike_command_args(args))
+                        for name, args in commands
+                    ]
+                    command_name, arguments = commands[0]
 
                 except Exception as e:
                     logger.error("Error: \n", str(e))
@@ -163,17 +195,19 @@ class Agent:
                 NEXT_ACTION_FILE_NAME,
             )
 
-            logger.typewriter_log(
-                "NEXT ACTION: ",
-                Fore.CYAN,
-                f"COMMAND = {Fore.CYAN}{command_name}{Style.RESET_ALL}  "
-                f"ARGUMENTS = {Fore.CYAN}{arguments}{Style.RESET_ALL}",
-            )
+            for name, args in commands or [(command_name, arguments)]:
+                logger.typewriter_log(
+                    "NEXT ACTION: ",
+                    Fore.CYAN,
+                    f"COMMAND = {Fore.CYAN}{name}{Style.RESET_ALL}  "
+                    f"ARGUMENTS = {Fore.CYAN}{args}{Style.RESET_ALL}",
+                )
 
             if not cfg.continuous_mode and self.next_action_count == 0:
                 # ### GET USER AUTHORIZATION TO EXECUTE COMMAND ###
                 # Get key press: Prompt the user to press enter to continue or escape
                 # to exit
+                input_span = profiler.span("user_input").start()
                 self.user_input = ""
                 logger.info(
                     "Enter 'y' to authorise command, 'y -N' to run N continuous commands, 's' to run self-feedback commands, "
@@ -248,6 +282,7 @@ class Agent:
                 elif user_input == "EXIT":
                     logger.info("Exiting...")
                     break
+                input_span.stop()
             else:
                 # Print authorized commands left value
                 logger.typewriter_log(
@@ -255,12 +290,29 @@ class Agent:
                 )
 
             # Execute command
-            if command_name is not None and command_name.lower().startswith("error"):
-                result = f"Could not execute command: {arguments}"
-            elif command_name == "human_feedback":
+            command_span = profiler.span("command").start()
+            # (command name, result) of each executed command, formatted below
+            command_results = []
+            if command_name == "human_feedback":
                 result = f"Human feedback: {user_input}"
             elif command_name == "self_feedback":
                 result = f"Self feedback: {user_input}"
+            elif len(commands) > 1:
+                results = execute_commands(
+                    self.command_registry,
+                    commands,
+                    self.config.prompt_generator,
+                    config=cfg,
+                )
+                command_results = [
+                    (name, command_result)
+                    for (name, _), command_result in zip(commands, results)
+                ]
+
+                if self.next_action_count > 0:
+                    self.next_action_count -= 1
+            elif command_name is not None and command_name.lower().startswith("error"):
+                result = f"Could not execute command: {arguments}"
             else:
                 command_result = execute_command(
                     self.command_registry,
@@ -269,21 +321,26 @@ class Agent:
                     self.config.prompt_generator,
                     config=cfg,
                 )
-                result = f"Command {command_name} returned: " f"{command_result}"
-
-                result_tlength = count_string_tokens(
-                    str(command_result), cfg.llm_model
-                )
-                memory_tlength = count_string_tokens(
-                    str(self.history.summary_message()), cfg.llm_model
-                )
-                if result_tlength + memory_tlength + 600 > cfg.token_limit:
-                    result = f"Failure: command {command_name} returned too much output. \
-                        Do not execute this command again with the same arguments."
+                command_results = [(command_name, command_result)]
 
                 if self.next_action_count > 0:
                     self.next_action_count -= 1
 
+            command_span.stop()
+
+            # Formatting counts tokens, which is profiled in its own phase rather
+            # than as part of the command. Results of several commands are merged,
+            # in order, into one message.
+            if command_results:
+                result = "\n\n".join(
+                    self._command_result_message(name, command_result, cfg)
+                    for name, command_result in command_results
+                )
+
+            # The rest of a streamed reply must be in the history before the result
+            if reply_future is not None:
+                reply_future.result()
+
             # Check if there's a result from the command append it to the message
             # history
             if result is not None:
@@ -295,11 +352,63 @@ class Agent:
                     "SYSTEM: ", Fore.YELLOW, "Unable to execute command"
                 )
 
+            if (cycle_timings := profiler.end_cycle()) is not None:
+                self.log_cycle_handler.log_cycle(
+                    self.config.ai_name,
+                    self.created_at,
+                    self.cycle_count,
+                    cycle_timings,
+                    CYCLE_PROFILE_FILE_NAME,
+                )
+
+    def _start_streamed_reply(self, cfg: Config) -> tuple[str, Future | None]:
+        """Streams the next reply, returning as soon as its JSON object is complete.
+
+        The rest of the reply is received in the background, so the command can be
+        parsed and dispatched in the meantime.
+
+        Returns:
+            tuple: The JSON object of the reply, and the future that completes once
+              the whole reply has been added to the message history (None if the
+              reply has already been received in full).
+        """
+        stream = JSONObjectStream()
+        reply_future = self._reply_executor.submit(
+            chat_with_ai,
+            cfg,
+            self,
+            self.system_prompt,
+            self.triggering_prompt,
+            cfg.token_limit,
+            cfg.llm_model,
+            on_delta=stream.feed,
+        )
+        reply_future.add_done_callback(lambda _: stream.close())
+
+        stream.wait()
+        if stream.complete and not reply_future.done():
+            return stream.object_text, reply_future
+        return reply_future.result(), None
+
+    def _command_result_message(
+        self, command_name: str, command_result, cfg: Config
+    ) -> str:
+        """Formats the result of a command for the message history"""
+        with profiler.span("token_count"):
+            result_tlength = count_string_tokens(str(command_result), cfg.llm_model)
+            memory_tlength = count_string_tokens(
+                str(self.history.summary_message()), cfg.llm_model
+            )
+        if result_tlength + memory_tlength + 600 > cfg.token_limit:
+            return f"Failure: command {command_name} returned too much output. \
+                Do not execute this command again with the same arguments."
+        return f"Command {command_name} returned: " f"{command_result}"
+
     def _resolve_pathlike_command_args(self, command_args):
         if "directory" in command_args and command_args["directory"] in {"", "/"}:
             command_args["directory"] = str(self.workspace.root)
         else:
-            for pathlike in ["filename", "directory", "clone_path"]:
+            for pathlike in PATHLIKE_ARGS:
                 if pathlike in command_args:
                     command_args[pathlike] = str(
                         self.workspace.get_path(command_args[pathlike])
@@ -337,7 +446,7 @@ class Agent:
             PROMPT_SUPERVISOR_FEEDBACK_FILE_NAME,
         )
 
-        feedback = create_chat_completion(prompt)
+        feedback = create_chat_completion(prompt, caller="self_feedback")
 
         self.log_cycle_handler.log_cycle(
             self.config.ai_name,
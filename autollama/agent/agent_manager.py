@@ -1,51 +1,88 @@
 """Agent manager for managing Llama agents"""
 from __future__ import annotations
 
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
 from autollama.config import Config
 from autollama.llm.base import ChatSequence
 from autollama.llm.chat import Message, create_chat_completion
+from autollama.llm.providers.groq import GROQ_CHAT_MODELS
+from autollama.llm.utils import count_string_tokens
+from autollama.logs import logger
 from autollama.singleton import Singleton
 
+# Messages kept at the start of every agent's history: the creation prompt, the
+# agent's acknowledgement and the task it was given
+PINNED_MESSAGES = 3
+# Tokens reserved for the agent's reply
+REPLY_TOKENS = 1000
+
+
+@dataclass
+class AgentStats:
+    """Latency and token usage of the calls to an agent"""
+
+    calls: int = 0
+    total_latency: float = 0.0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+    @property
+    def mean_latency(self) -> float:
+        return self.total_latency / self.calls if self.calls else 0.0
+
 
 class AgentManager(metaclass=Singleton):
-    """Agent manager for managing Llama agents"""
+    """Agent manager for managing Llama agents
+
+    Calls to different agents may run concurrently, e.g. with `message_agents`;
+    calls to the same agent are serialized so that its turns stay in order.
+    """
 
     def __init__(self):
         self.next_key = 0
         self.agents: dict[
             int, tuple[str, list[Message], str]
         ] = {}  # key, (task, full_message_history, model)
+        self.stats: dict[int, AgentStats] = {}
         self.cfg = Config()
+        self._lock = threading.Lock()
+        self._agent_locks: dict[int, threading.Lock] = {}
 
     # Create new Llama agent
     # TODO: Centralise use of create_chat_completion() to globally enforce token limit
 
     def create_agent(
-        self, task: str, creation_prompt: str, model: str
+        self, task: str, creation_prompt: str, model: str | None = None
     ) -> tuple[int, str]:
         """Create a new agent and return its key
 
         Args:
             task: The task to perform
             creation_prompt: Prompt passed to the LLM at creation
-            model: The model to use to run this agent
+            model: The model to use to run this agent. Defaults to LLM_MODEL.
 
         Returns:
             The key of the new agent
         """
+        model = model or self.cfg.llm_model
         messages = ChatSequence.for_model(model, [Message("user", creation_prompt)])
 
-        
+        with self._lock:
+            key = self.next_key
+            # This is done instead of len(agents) to make keys unique even if agents
+            # are deleted
+            self.next_key += 1
+            self.stats[key] = AgentStats()
+            self._agent_locks[key] = threading.Lock()
+
         # Start Llama instance
-        agent_reply = create_chat_completion(prompt=messages)
+        agent_reply = self._complete(key, messages)
 
         messages.add("assistant", agent_reply)
-
-        key = self.next_key
-        # This is done instead of len(agents) to make keys unique even if agents
-        # are deleted
-        self.next_key += 1
-
         self.agents[key] = (task, list(messages), model)
 
         return key, agent_reply
@@ -60,19 +97,42 @@ class AgentManager(metaclass=Singleton):
         Returns:
             The agent's response
         """
-        task, messages, model = self.agents[int(key)]
+        key = int(key)
+        with self._agent_locks[key]:
+            task, messages, model = self.agents[key]
 
-        # Add user message to message history before sending to agent
-        messages = ChatSequence.for_model(model, messages)
-        messages.add("user", message)
+            # Add user message to message history before sending to agent
+            messages = ChatSequence.for_model(model, messages)
+            messages.add("user", message)
+            self._trim_history(key, messages)
 
-        # Start Llama instance
-        agent_reply = create_chat_completion(prompt=messages)
+            # Start Llama instance
+            agent_reply = self._complete(key, messages)
 
-        messages.add("assistant", agent_reply)
+            messages.add("assistant", agent_reply)
+            self.agents[key] = (task, list(messages), model)
 
         return agent_reply
 
+    def message_agents(self, messages: dict[str | int, str]) -> dict[int, str]:
+        """Send messages to several agents at once and return their responses
+
+        Args:
+            messages: The message to send to each agent, by agent key
+
+        Returns:
+            The response of each agent, by agent key
+        """
+        keys = [int(key) for key in messages]
+        if len(keys) <= 1:
+            return {key: self.message_agent(key, messages[key]) for key in messages}
+
+        with ThreadPoolExecutor(
+            max_workers=min(self.cfg.sub_agent_concurrency, len(keys))
+        ) as executor:
+            replies = executor.map(self.message_agent, keys, messages.values())
+            return dict(zip(keys, replies))
+
     def list_agents(self) -> list[tuple[str | int, str]]:
         """Return a list of all agents
 
@@ -83,6 +143,14 @@ class AgentManager(metaclass=Singleton):
         # Return a list of agent keys and their tasks
         return [(key, task) for key, (task, _, _) in self.agents.items()]
 
+    def get_agent_stats(self) -> dict[int, AgentStats]:
+        """Return the latency and token usage of each agent
+
+        Returns:
+            The stats of each agent, by agent key
+        """
+        return dict(self.stats)
+
     def delete_agent(self, key: str | int) -> bool:
         """Delete an agent from the agent manager
 
@@ -95,6 +163,39 @@ class AgentManager(metaclass=Singleton):
 
         try:
             del self.agents[int(key)]
+            self.stats.pop(int(key), None)
             return True
         except KeyError:
             return False
+
+    def _complete(self, key: int, messages: ChatSequence) -> str:
+        """Gets the agent's reply to its messages, recording latency and usage"""
+        start = time.perf_counter()
+        agent_reply = create_chat_completion(prompt=messages, caller="sub_agent")
+        latency = time.perf_counter() - start
+
+        stats = self.stats[key]
+        stats.calls += 1
+        stats.total_latency += latency
+        stats.prompt_tokens += messages.token_length
+        stats.completion_tokens += count_string_tokens(agent_reply, messages.model.name)
+        logger.debug(
+            f"Agent {key} replied in {latency:.2f}s; "
+            f"{stats.calls} calls, mean latency {stats.mean_latency:.2f}s"
+        )
+        return agent_reply
+
+    def _trim_history(self, key: int, messages: ChatSequence) -> None:
+        """Drops the oldest messages, after the pinned ones, until the history fits
+        the token budget of the agent's model"""
+        model_info = GROQ_CHAT_MODELS[messages.model.name]
+        budget = min(self.cfg.token_limit, model_info.max_tokens) - REPLY_TOKENS
+
+        n_trimmed = 0
+        # Whole turns are dropped so that user and assistant messages still alternate;
+        # the last message is the one being sent, which is always kept
+        while messages.token_length > budget and len(messages) > PINNED_MESSAGES + 2:
+            del messages.messages[PINNED_MESSAGES : PINNED_MESSAGES + 2]
+            n_trimmed += 2
+        if n_trimmed:
+            logger.debug(f"Trimmed {n_trimmed} messages from agent {key}'s history")
@@ -1,16 +1,21 @@
 """ Command and Control """
 import json
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 from typing import Dict, List, Union
 
 from autollama.agent.agent_manager import AgentManager
 from autollama.commands.command import CommandRegistry, command
-from autollama.commands.web_requests import scrape_links, scrape_text
 from autollama.config import Config
-from autollama.processing.text import summarize_text
 from autollama.prompts.generator import PromptGenerator
 from autollama.speech import say_text
 from autollama.url_utils.validators import validate_url
 
+# Arguments of commands that name a path in the workspace
+PATHLIKE_ARGS = ("filename", "directory", "clone_path")
+# Commands that may touch any path in the workspace, e.g. by running a shell in it
+WORKSPACE_WIDE_COMMANDS = ("execute_shell", "execute_shell_popen")
+
 
 def is_valid_int(value: str) -> bool:
     """Check if the value is a valid integer
@@ -69,6 +74,26 @@ def get_command(response_json: Dict):
         return "Error:", str(e)
 
 
+def get_commands(response_json: Dict) -> List[tuple]:
+    """Parse the response and return the name and arguments of each command
+
+    The response lists its commands in "commands", or has a single "command".
+
+    Args:
+        response_json (json): The response from the AI
+
+    Returns:
+        list: The (command name, arguments) tuple of each command, in order
+    """
+    if not isinstance(response_json, dict) or "commands" not in response_json:
+        return [get_command(response_json)]
+
+    commands = response_json["commands"]
+    if not isinstance(commands, list) or not commands:
+        return [("Error:", "'commands' is not a non-empty list")]
+    return [get_command({"command": command}) for command in commands]
+
+
 def map_command_synonyms(command_name: str):
     """Takes the original command name given by the AI, and checks if the
     string matches a list of common/known hallucinations
@@ -128,6 +153,82 @@ def execute_command(
         return f"Error: {str(e)}"
 
 
+def execute_commands(
+    command_registry: CommandRegistry,
+    commands: List[tuple],
+    prompt: PromptGenerator,
+    config: Config,
+) -> List[str]:
+    """Execute independent commands concurrently and return their results in order
+
+    Commands that touch the same workspace path (or a path inside another's) are
+    executed one after the other, in the order they were given.
+
+    Args:
+        commands (list): The (command name, arguments) tuple of each command
+
+    Returns:
+        list: The result of each command, in the same order as the commands
+    """
+
+    def execute_lane(lane: List[int]) -> None:
+        for i in lane:
+            command_name, arguments = commands[i]
+            if command_name.lower().startswith("error"):
+                results[i] = f"Could not execute command: {arguments}"
+            else:
+                results[i] = execute_command(
+                    command_registry, command_name, arguments, prompt, config
+                )
+
+    results = [None] * len(commands)
+    lanes = _group_commands_by_path(commands, Path(config.workspace_path))
+    with ThreadPoolExecutor(
+        max_workers=max(1, min(config.command_concurrency, len(lanes)))
+    ) as executor:
+        for future in [executor.submit(execute_lane, lane) for lane in lanes]:
+            future.result()
+    return results
+
+
+def _group_commands_by_path(commands: List[tuple], workspace: Path) -> List[List[int]]:
+    """Group the indices of commands into lanes, so that the commands touching
+    overlapping paths are in the same lane, in their original order"""
+
+    def overlap(a: Path, b: Path) -> bool:
+        return a == b or a.is_relative_to(b) or b.is_relative_to(a)
+
+    lanes: List[tuple[List[int], List[Path]]] = []
+    for i, (command_name, arguments) in enumerate(commands):
+        if command_name in WORKSPACE_WIDE_COMMANDS:
+            paths = [workspace]
+        elif isinstance(arguments, dict):
+            paths = [
+                Path(str(arguments[arg])).absolute()
+                for arg in PATHLIKE_ARGS
+                if arguments.get(arg)
+            ]
+        else:
+            paths = []
+
+        conflicting = [
+            lane
+            for lane in lanes
+            if any(overlap(a, b) for a in paths for b in lane[1])
+        ]
+        # Lanes that didn't conflict with each other can run in any order
+        lane = ([], [])
+        for other in conflicting:
+            lanes.remove(other)
+            lane[0].extend(other[0])
+            lane[1].extend(other[1])
+        lane[0].append(i)
+        lane[1].extend(paths)
+        lanes.append(lane)
+
+    return [sorted(indices) for indices, _ in lanes]
+
+
 @command(
     "get_text_summary", "Get text summary", '"url": "<url>", "question": "<question>"'
 )
@@ -142,6 +243,11 @@ def get_text_summary(url: str, question: str, config: Config) -> str:
     Returns:
         str: The summary of the text
     """
+    # Imported here so that the web and text processing modules are only loaded
+    # once the command is executed
+    from autollama.commands.web_requests import scrape_text
+    from autollama.processing.text import summarize_text
+
     text = scrape_text(url, config)
     summary, _ = summarize_text(text, question=question)
 
@@ -159,6 +265,8 @@ def get_hyperlinks(url: str, config: Config) -> Union[str, List[str]]:
     Returns:
         str or list: The hyperlinks on the page
     """
+    from autollama.commands.web_requests import scrape_links
+
     return scrape_links(url, config)
 
 
@@ -216,6 +324,36 @@ def message_agent(key: str, message: str, config: Config) -> str:
     return agent_response
 
 
+@command(
+    "message_agents",
+    "Message several Llama Agents at once",
+    '"messages": "<{key: message}>"',
+)
+def message_agents(messages: Union[Dict[str, str], str], config: Config) -> str:
+    """Message several agents concurrently
+
+    Args:
+        messages (Union[Dict[str, str], str]): The message for each agent, by key
+
+    Returns:
+        str: The response of each agent
+    """
+    if isinstance(messages, str):
+        try:
+            messages = json.loads(messages)
+        except json.JSONDecodeError:
+            messages = None
+    if not isinstance(messages, dict) or not messages:
+        return "Invalid messages, must be an object of agent keys to messages."
+    if not all(is_valid_int(key) for key in messages):
+        return "Invalid key, must be an integer."
+
+    agent_responses = AgentManager().message_agents(messages)
+    return "\n\n".join(
+        f"Agent {key} responded: {response}" for key, response in agent_responses.items()
+    )
+
+
 @command("list_agents", "List Llama Agents", "() -> str")
 def list_agents(config: Config) -> str:
     """List all agents
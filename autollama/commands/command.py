@@ -1,6 +1,7 @@
 import functools
 import importlib
 import inspect
+from dataclasses import dataclass
 from typing import Any, Callable, Optional
 
 from autollama.config import Config
@@ -48,6 +49,59 @@ class Command:
         return f"{self.name}: {self.description}, args: {self.signature}"
 
 
+@dataclass
+class CommandSpec:
+    """The manifest entry of a command, describing it without importing its module.
+
+    Attributes:
+        name (str): The name of the command.
+        description (str): A brief description of what the command does.
+        signature (str): The signature of the function that the command executes.
+        function (str): The name of the decorated function in the module.
+        enabled (bool | Callable[[Config], bool]): Whether the command is enabled.
+        disabled_reason (str): Why the command is disabled, if it is.
+    """
+
+    name: str
+    description: str
+    signature: str
+    function: str
+    enabled: bool | Callable[[Config], bool] = True
+    disabled_reason: Optional[str] = None
+
+
+class LazyCommand(Command):
+    """A command whose module is only imported the first time it is executed."""
+
+    def __init__(self, module_name: str, spec: CommandSpec):
+        super().__init__(
+            name=spec.name,
+            description=spec.description,
+            method=self._import_method,
+            signature=spec.signature,
+            enabled=spec.enabled,
+            disabled_reason=spec.disabled_reason,
+        )
+        self.module_name = module_name
+        self.function_name = spec.function
+
+    def _import_method(self, *args, **kwargs) -> Any:
+        module = importlib.import_module(self.module_name)
+        func = getattr(module, self.function_name)
+        cmd = getattr(func, "command", None)
+        if cmd is None or (cmd.name, cmd.description, cmd.signature) != (
+            self.name,
+            self.description,
+            self.signature,
+        ):
+            logger.warn(
+                "Command '%s' does not match its entry in the command manifest",
+                self.name,
+            )
+        self.method = func
+        return func(*args, **kwargs)
+
+
 class CommandRegistry:
     """
     The CommandRegistry class is a manager for a collection of Command objects.
@@ -103,6 +157,29 @@ class CommandRegistry:
         ]
         return "\n".join(commands_list)
 
+    def register_manifest(self, module_name: str, specs: list[CommandSpec]) -> None:
+        """
+        Registers the commands of a module from their manifest entries, without
+        importing the module until one of them is executed.
+
+        Like the `command` decorator, only the commands enabled for the current
+        config are registered.
+
+        Args:
+            module_name (str): The name of the module implementing the commands.
+            specs (list[CommandSpec]): The manifest entries of its commands.
+        """
+        config = Config()
+        for spec in specs:
+            enabled = spec.enabled(config) if callable(spec.enabled) else spec.enabled
+            if not enabled:
+                if spec.disabled_reason is not None:
+                    logger.debug(
+                        "Command '%s' is disabled: %s", spec.name, spec.disabled_reason
+                    )
+                continue
+            self.register(LazyCommand(module_name, spec))
+
     def import_commands(self, module_name: str) -> None:
         """
         Imports the specified Python module containing command plugins.
@@ -92,7 +92,7 @@ def generate_image_with_hf(prompt: str, filename: str, config: Config) -> str:
                 if "estimated_time" in error:
                     delay = error["estimated_time"]
                     logger.debug(response.text)
-                    logger.info("Retrying in", delay)
+                    logger.info("Retrying in %s", delay)
                     time.sleep(delay)
                 else:
                     break
@@ -0,0 +1,163 @@
+"""
+Catalog of the built-in commands, so that they can be registered without importing
+the modules implementing them.
+
+The entries must match the `@command` decorators of the modules: the command of a
+module is only imported, and checked against its entry, the first time it runs.
+"""
+from autollama.commands.command import CommandSpec
+
+COMMAND_MANIFEST: dict[str, list[CommandSpec]] = {
+    "autollama.commands.analyze_code": [
+        CommandSpec(
+            "analyze_code",
+            "Analyze Code",
+            '"code": "<full_code_string>"',
+            "analyze_code",
+        ),
+    ],
+    "autollama.commands.audio_text": [
+        CommandSpec(
+            "read_audio_from_file",
+            "Convert Audio to text",
+            '"filename": "<filename>"',
+            "read_audio_from_file",
+            lambda config: config.huggingface_audio_to_text_model
+            and config.huggingface_api_token,
+            "Configure huggingface_audio_to_text_model and Hugging Face api token.",
+        ),
+    ],
+    "autollama.commands.execute_code": [
+        CommandSpec(
+            "execute_python_file",
+            "Execute Python File",
+            '"filename": "<filename>"',
+            "execute_python_file",
+        ),
+        CommandSpec(
+            "execute_shell",
+            "Execute Shell Command, non-interactive commands only",
+            '"command_line": "<command_line>"',
+            "execute_shell",
+            lambda config: config.execute_local_commands,
+            "You are not allowed to run local shell commands. To execute"
+            " shell commands, EXECUTE_LOCAL_COMMANDS must be set to 'True' "
+            "in your config file: .env - do not attempt to bypass the restriction.",
+        ),
+        CommandSpec(
+            "execute_shell_popen",
+            "Execute Shell Command, non-interactive commands only",
+            '"command_line": "<command_line>"',
+            "execute_shell_popen",
+            lambda config: config.execute_local_commands,
+            "You are not allowed to run local shell commands. To execute"
+            " shell commands, EXECUTE_LOCAL_COMMANDS must be set to 'True' "
+            "in your config. Do not attempt to bypass the restriction.",
+        ),
+    ],
+    "autollama.commands.file_operations": [
+        CommandSpec(
+            "read_file", "Read a file", '"filename": "<filename>"', "read_file"
+        ),
+        CommandSpec(
+            "write_to_file",
+            "Write to file",
+            '"filename": "<filename>", "text": "<text>"',
+            "write_to_file",
+        ),
+        CommandSpec(
+            "append_to_file",
+            "Append to file",
+            '"filename": "<filename>", "text": "<text>"',
+            "append_to_file",
+        ),
+        CommandSpec(
+            "delete_file", "Delete file", '"filename": "<filename>"', "delete_file"
+        ),
+        CommandSpec(
+            "list_files",
+            "List Files in Directory",
+            '"directory": "<directory>"',
+            "list_files",
+        ),
+        CommandSpec(
+            "download_file",
+            "Download File",
+            '"url": "<url>", "filename": "<filename>"',
+            "download_file",
+            lambda config: config.allow_downloads,
+            "Error: You do not have user authorization to download files locally.",
+        ),
+    ],
+    "autollama.commands.git_operations": [
+        CommandSpec(
+            "clone_repository",
+            "Clone Repository",
+            '"url": "<repository_url>", "clone_path": "<clone_path>"',
+            "clone_repository",
+            lambda config: config.github_username and config.github_api_key,
+            "Configure github_username and github_api_key.",
+        ),
+    ],
+    "autollama.commands.google_search": [
+        # Only one of the two is enabled for a given config
+        CommandSpec(
+            "google",
+            "Google Search",
+            '"query": "<query>"',
+            "google_search",
+            lambda config: not config.google_api_key,
+        ),
+        CommandSpec(
+            "google",
+            "Google Search",
+            '"query": "<query>"',
+            "google_official_search",
+            lambda config: bool(config.google_api_key)
+            and bool(config.custom_search_engine_id),
+            "Configure google_api_key and custom_search_engine_id.",
+        ),
+    ],
+    "autollama.commands.image_gen": [
+        CommandSpec(
+            "generate_image",
+            "Generate Image",
+            '"prompt": "<prompt>"',
+            "generate_image",
+            lambda config: config.image_provider,
+            "Requires a image provider to be set.",
+        ),
+    ],
+    "autollama.commands.improve_code": [
+        CommandSpec(
+            "improve_code",
+            "Get Improved Code",
+            '"suggestions": "<list_of_suggestions>", "code": "<full_code_string>"',
+            "improve_code",
+        ),
+    ],
+    "autollama.commands.web_selenium": [
+        CommandSpec(
+            "browse_website",
+            "Browse Website",
+            '"url": "<url>", "question": "<what_you_want_to_find_on_website>"',
+            "browse_website",
+        ),
+    ],
+    "autollama.commands.write_tests": [
+        CommandSpec(
+            "write_tests",
+            "Write Tests",
+            '"code": "<full_code_string>", "focus": "<list_of_focus_areas>"',
+            "write_tests",
+        ),
+    ],
+    "autollama.commands.task_statuses": [
+        CommandSpec(
+            "task_complete",
+            "Task Complete (Shutdown)",
+            '"reason": "<reason>"',
+            "task_complete",
+        ),
+    ],
+}
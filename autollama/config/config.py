@@ -29,6 +29,16 @@ class Config(metaclass=Singleton):
         self.exit_key = os.getenv("EXIT_KEY", "n")
         self.plain_output = os.getenv("PLAIN_OUTPUT", "False") == "True"
 
+        # e.g. "memory=WARNING,llm=DEBUG"
+        log_levels = os.getenv("LOG_LEVELS")
+        self.log_levels = {}
+        if log_levels:
+            for subsystem_level in log_levels.split(","):
+                subsystem, _, level = subsystem_level.partition("=")
+                self.log_levels[subsystem.strip()] = level.strip().upper()
+        self.log_file_level = os.getenv("LOG_FILE_LEVEL", "DEBUG").upper()
+        self.typing_simulation = os.getenv("TYPING_SIMULATION", "True") == "True"
+
         disabled_command_categories = os.getenv("DISABLED_COMMAND_CATEGORIES")
         if disabled_command_categories:
             self.disabled_command_categories = disabled_command_categories.split(",")
@@ -53,19 +63,57 @@ class Config(metaclass=Singleton):
         )
         self.llm_model = os.getenv("LLM_MODEL", "llama3-8b-8192")
         self.token_limit = int(os.getenv("TOKEN_LIMIT", 8000))
+        self.tokenizers_dir = os.getenv("TOKENIZERS_DIR", "data/tokenizers")
         self.embedding_model = os.getenv("EMBEDDING_MODEL", "en_core_web_md")
+        self.embedding_batch_size = int(os.getenv("EMBEDDING_BATCH_SIZE", "256"))
+        self.embedding_n_process = int(os.getenv("EMBEDDING_N_PROCESS", "1"))
+        self.embedding_cache_size = int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))
+        self.embedding_cache_path = os.getenv("EMBEDDING_CACHE_PATH", "")
         self.browse_spacy_language_model = os.getenv(
             "BROWSE_SPACY_LANGUAGE_MODEL", "en_core_web_sm"
         )
 
         self.groq_api_key = os.getenv("GROQ_API_KEY")
         self.temperature = float(os.getenv("TEMPERATURE", "0"))
+        self.stream_responses = os.getenv("STREAM_RESPONSES", "False") == "True"
+        self.profile_cycles = os.getenv("PROFILE_CYCLES", "False") == "True"
+        self.summary_max_stale_messages = int(
+            os.getenv("SUMMARY_MAX_STALE_MESSAGES", "6")
+        )
+        self.summarization_concurrency = int(
+            os.getenv("SUMMARIZATION_CONCURRENCY", "4")
+        )
+        self.rate_limit_requests_per_minute = int(
+            os.getenv("RATE_LIMIT_REQUESTS_PER_MINUTE", "30")
+        )
+        self.rate_limit_tokens_per_minute = int(
+            os.getenv("RATE_LIMIT_TOKENS_PER_MINUTE", "6000")
+        )
+        self.rate_limit_max_backoff = float(os.getenv("RATE_LIMIT_MAX_BACKOFF", "60"))
+        self.llm_telemetry_file = os.getenv("LLM_TELEMETRY_FILE", "")
+        self.llm_telemetry_max_records = int(
+            os.getenv("LLM_TELEMETRY_MAX_RECORDS", "10000")
+        )
+
+        self.llm_response_cache = os.getenv("LLM_RESPONSE_CACHE", "False") == "True"
+        self.llm_response_cache_path = os.getenv(
+            "LLM_RESPONSE_CACHE_PATH", "data/llm_response_cache.sqlite3"
+        )
+        self.llm_response_cache_ttl = float(
+            os.getenv("LLM_RESPONSE_CACHE_TTL", str(7 * 24 * 3600))
+        )
+        self.llm_response_cache_max_entries = int(
+            os.getenv("LLM_RESPONSE_CACHE_MAX_ENTRIES", "10000")
+        )
         self.execute_local_commands = (
             os.getenv("EXECUTE_LOCAL_COMMANDS", "False") == "True"
         )
         self.restrict_to_workspace = (
             os.getenv("RESTRICT_TO_WORKSPACE", "True") == "True"
         )
+        self.parallel_commands = os.getenv("PARALLEL_COMMANDS", "False") == "True"
+        self.command_concurrency = int(os.getenv("COMMAND_CONCURRENCY", "4"))
+        self.sub_agent_concurrency = int(os.getenv("SUB_AGENT_CONCURRENCY", "4"))
 
         self.elevenlabs_api_key = os.getenv("ELEVENLABS_API_KEY")
         self.elevenlabs_voice_1_id = os.getenv("ELEVENLABS_VOICE_1_ID")
@@ -112,6 +160,8 @@ class Config(metaclass=Singleton):
 
         self.memory_backend = os.getenv("MEMORY_BACKEND", "json_file")
         self.memory_index = os.getenv("MEMORY_INDEX", "auto-llama-memory")
+        self.ivf_n_lists = int(os.getenv("IVF_N_LISTS", "0"))
+        self.ivf_n_probe = int(os.getenv("IVF_N_PROBE", "8"))
 
         self.redis_host = os.getenv("REDIS_HOST", "localhost")
         self.redis_port = int(os.getenv("REDIS_PORT", "6379"))
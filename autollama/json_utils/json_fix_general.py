@@ -34,7 +34,7 @@ def fix_invalid_escape(json_to_load: str, error_message: str) -> str:
             json.loads(json_to_load)
             return json_to_load
         except json.JSONDecodeError as e:
-            logger.debug("json loads error - fix invalid escape", e)
+            logger.debug("json loads error - fix invalid escape %s", e)
             error_message = str(e)
     return json_to_load
 
@@ -98,11 +98,11 @@ def correct_json(json_to_load: str) -> str:
     """
 
     try:
-        logger.debug("json", json_to_load)
+        logger.debug("json %s", json_to_load)
         json.loads(json_to_load)
         return json_to_load
     except json.JSONDecodeError as e:
-        logger.debug("json loads error", e)
+        logger.debug("json loads error %s", e)
         error_message = str(e)
         if error_message.startswith("Invalid \\escape"):
             json_to_load = fix_invalid_escape(json_to_load, error_message)
@@ -114,7 +114,7 @@ def correct_json(json_to_load: str) -> str:
                 json.loads(json_to_load)
                 return json_to_load
             except json.JSONDecodeError as e:
-                logger.debug("json loads error - add quotes", e)
+                logger.debug("json loads error - add quotes %s", e)
                 error_message = str(e)
         if balanced_str := balance_braces(json_to_load):
             return balanced_str
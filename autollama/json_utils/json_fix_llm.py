@@ -4,13 +4,11 @@ from __future__ import annotations
 
 import contextlib
 import json
+from collections import Counter
 from typing import Any, Dict
 
-from colorama import Fore
-from regex import regex
-
 from autollama.config import Config
-from autollama.json_utils.json_fix_general import correct_json
+from autollama.json_utils.json_stream import JSONStreamParser
 from autollama.llm.utils import call_ai_function
 from autollama.logs import logger
 from autollama.speech import say_text
@@ -36,6 +34,15 @@ JSON_SCHEMA = """
 
 CFG = Config()
 
+# How replies were parsed: "valid" JSON, "repaired" by the tolerant parser, or
+# "llm_repair_calls" made, of which "llm_repaired" succeeded; "failed" otherwise
+JSON_FIX_COUNTS: Counter[str] = Counter()
+
+
+def get_json_fix_stats() -> dict[str, int]:
+    """Get how many replies were valid JSON, repaired, or needed an LLM repair call"""
+    return dict(JSON_FIX_COUNTS)
+
 
 def auto_fix_json(json_string: str, schema: str) -> str:
     """Fix the given JSON string to make it parseable and fully compliant with
@@ -63,7 +70,11 @@ def auto_fix_json(json_string: str, schema: str) -> str:
     if not json_string.startswith("`"):
         json_string = "```json\n" + json_string + "\n```"
     result_string = call_ai_function(
-        function_string, args, description_string, model=CFG.fast_llm_model
+        function_string,
+        args,
+        description_string,
+        model=CFG.llm_model,
+        caller="json_fix",
     )
     logger.debug("------------ JSON FIX ATTEMPT ---------------")
     logger.debug(f"Original JSON: {json_string}")
@@ -97,27 +108,15 @@ def fix_json_using_multiple_techniques(assistant_reply: str) -> Dict[Any, Any]:
     if assistant_reply.endswith("```"):
         assistant_reply = assistant_reply[:-3]
     try:
-        return json.loads(assistant_reply)  # just check the validity
-    except json.JSONDecodeError:  # noqa: E722
-        pass
-
-    if assistant_reply.startswith("json "):
-        assistant_reply = assistant_reply[5:]
-        assistant_reply = assistant_reply.strip()
-    try:
-        return json.loads(assistant_reply)  # just check the validity
+        json_object = json.loads(assistant_reply)
+        JSON_FIX_COUNTS["valid"] += 1
+        return json_object
     except json.JSONDecodeError:  # noqa: E722
         pass
 
     # Parse and print Assistant response
     assistant_reply_json = fix_and_parse_json(assistant_reply)
     logger.debug("Assistant reply JSON: %s", str(assistant_reply_json))
-    if assistant_reply_json == {}:
-        assistant_reply_json = attempt_to_fix_json_by_finding_outermost_brackets(
-            assistant_reply
-        )
-
-    logger.debug("Assistant reply JSON 2: %s", str(assistant_reply_json))
     if assistant_reply_json != {}:
         return assistant_reply_json
 
@@ -128,6 +127,7 @@ def fix_json_using_multiple_techniques(assistant_reply: str) -> Dict[Any, Any]:
     if CFG.speak_mode:
         say_text("I have received an invalid JSON response from the Groq API.")
 
+    JSON_FIX_COUNTS["failed"] += 1
     return {}
 
 
@@ -146,27 +146,21 @@ def fix_and_parse_json(
     """
 
     with contextlib.suppress(json.JSONDecodeError):
-        json_to_load = json_to_load.replace("\t", "")
         return json.loads(json_to_load)
 
-    with contextlib.suppress(json.JSONDecodeError):
-        json_to_load = correct_json(json_to_load)
-        return json.loads(json_to_load)
-    # Let's do something manually:
-    # sometimes Llama responds with something BEFORE the braces:
-    # "I'm sorry, I don't understand. Please try again."
-    # {"text": "I'm sorry, I don't understand. Please try again.",
-    #  "confidence": 0.0}
-    # So let's try to find the first brace and then parse the rest
-    #  of the string
-    try:
-        brace_index = json_to_load.index("{")
-        maybe_fixed_json = json_to_load[brace_index:]
-        last_brace_index = maybe_fixed_json.rindex("}")
-        maybe_fixed_json = maybe_fixed_json[: last_brace_index + 1]
-        return json.loads(maybe_fixed_json)
-    except (json.JSONDecodeError, ValueError) as e:
-        return try_ai_fix(try_to_fix_with_llama, e, json_to_load)
+    # Parse the JSON object out of the reply, repairing it along the way
+    parser = JSONStreamParser()
+    parser.feed(json_to_load)
+    if json_object := parser.finish():
+        logger.debug(f"Parsed JSON with {parser.repairs} repairs")
+        JSON_FIX_COUNTS["repaired"] += 1
+        return json_object
+
+    return try_ai_fix(
+        try_to_fix_with_llama,
+        ValueError("No JSON object could be parsed"),
+        json_to_load,
+    )
 
 
 def try_ai_fix(
@@ -195,45 +189,17 @@ def try_ai_fix(
             " slightly."
         )
     # Now try to fix this up using the ai_functions
+    JSON_FIX_COUNTS["llm_repair_calls"] += 1
+    logger.debug(
+        f"Repairing JSON with an LLM call "
+        f"({JSON_FIX_COUNTS['llm_repair_calls']} so far)"
+    )
     ai_fixed_json = auto_fix_json(json_to_load, JSON_SCHEMA)
 
     if ai_fixed_json != "failed":
+        JSON_FIX_COUNTS["llm_repaired"] += 1
         return json.loads(ai_fixed_json)
     # This allows the AI to react to the error message,
     #   which usually results in it correcting its ways.
     # logger.error("Failed to fix AI output, telling the AI.")
     return {}
-
-
-def attempt_to_fix_json_by_finding_outermost_brackets(json_string: str):
-    if CFG.speak_mode and CFG.debug_mode:
-        say_text(
-            "I have received an invalid JSON response from the Groq API. "
-            "Trying to fix it now."
-        )
-        logger.error("Attempting to fix JSON by finding outermost brackets\n")
-
-    try:
-        json_pattern = regex.compile(r"\{(?:[^{}]|(?R))*\}")
-        json_match = json_pattern.search(json_string)
-
-        if json_match:
-            # Extract the valid JSON object from the string
-            json_string = json_match.group(0)
-            logger.typewriter_log(
-                title="Apparently json was fixed.", title_color=Fore.GREEN
-            )
-            if CFG.speak_mode and CFG.debug_mode:
-                say_text("Apparently json was fixed.")
-        else:
-            return {}
-
-    except (json.JSONDecodeError, ValueError):
-        if CFG.debug_mode:
-            logger.error(f"Error: Invalid JSON: {json_string}\n")
-        if CFG.speak_mode:
-            say_text("Didn't work. I will have to ignore this response then.")
-        logger.error("Error: Invalid JSON, setting it to empty JSON now.\n")
-        json_string = {}
-
-    return fix_and_parse_json(json_string)
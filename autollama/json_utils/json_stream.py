@@ -0,0 +1,370 @@
+"""Tolerant, incremental parsing of the JSON objects in LLM responses"""
+from __future__ import annotations
+
+import re
+import threading
+from typing import Any
+
+_WHITESPACE = " \t\r\n"
+_ESCAPES = {
+    '"': '"',
+    "'": "'",
+    "\\": "\\",
+    "/": "/",
+    "b": "\b",
+    "f": "\f",
+    "n": "\n",
+    "r": "\r",
+    "t": "\t",
+}
+_LITERALS = {
+    "true": True,
+    "false": False,
+    "null": None,
+    "True": True,
+    "False": False,
+    "None": None,
+    "NaN": None,
+}
+_STRING_RUNS = {'"': re.compile(r'[^"\\]+'), "'": re.compile(r"[^'\\]+")}
+# An unquoted token, e.g. an unquoted key or a literal
+_TOKEN_RUN = re.compile(r"""[^\s{}\[\],:"]+""")
+_NUMBER = re.compile(r"-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?")
+
+
+class _Frame:
+    """An object or array being parsed, and what it expects next"""
+
+    __slots__ = ("container", "key", "expects")
+
+    def __init__(self, container: dict | list) -> None:
+        self.container = container
+        self.key: str | None = None
+        # "key", "colon", "value" or "comma" for objects; "value" or "comma" for arrays
+        self.expects = "key" if isinstance(container, dict) else "value"
+
+
+class JSONStreamParser:
+    """
+    Single-pass parser for the JSON object in an LLM response, which accepts the
+    response in chunks as it is streamed.
+
+    Each character is looked at once, so parsing takes linear time however malformed
+    the response is. Rather than failing, the parser tolerates the usual defects of
+    LLM output, and counts them in `repairs`:
+    - prose or code fences around the object: everything before the first '{' and
+      after its matching '}' is ignored;
+    - unquoted keys, single-quoted strings and Python literals (True, None, ...);
+    - invalid escape sequences, which are kept as they are, and raw control
+      characters in strings;
+    - unescaped quotes inside strings, recognised because they are not followed by
+      a delimiter (',', ':', '}' or ']');
+    - missing or trailing commas, and unbalanced brackets: whatever is still open
+      when the response ends is closed by `finish`.
+    """
+
+    def __init__(self) -> None:
+        self.value: dict | None = None
+        self.complete = False
+        # Offsets of the object in the response, once it is complete
+        self.start: int | None = None
+        self.end: int | None = None
+        self.repairs = 0
+
+        self._offset = 0
+        self._stack: list[_Frame] = []
+        # Number of objects and arrays open in the stack
+        self._open_counts = {dict: 0, list: 0}
+        # The string being parsed, its quote character, and its pending escape
+        self._string: list[str] | None = None
+        self._quote = ""
+        self._escape: str | None = None
+        self._has_surrogates = False
+        # Whitespace seen after a quote that may or may not close the string
+        self._closing: str | None = None
+        self._token: list[str] | None = None
+
+    def feed(self, chunk: str) -> None:
+        """Parses the next chunk of the response"""
+        i, n = 0, len(chunk)
+        while i < n and not self.complete:
+            if self._string is not None:
+                i = self._feed_string(chunk, i)
+                continue
+
+            if self._token is not None:
+                match = _TOKEN_RUN.match(chunk, i)
+                if match:
+                    self._token.append(match.group())
+                    i = match.end()
+                    continue
+                self._end_token()
+
+            char = chunk[i]
+            if not self._stack:
+                # Skip anything before the object, e.g. prose or a code fence
+                i = chunk.find("{", i)
+                if i < 0:
+                    break
+                self.start = self._offset + i
+                self._open({})
+            elif char in _WHITESPACE:
+                pass
+            elif char == "{":
+                self._open({})
+            elif char == "[":
+                self._open([])
+            elif char in "}]":
+                self._close(dict if char == "}" else list, self._offset + i)
+            elif char == ",":
+                self._comma()
+            elif char == ":":
+                self._colon()
+            elif char in "\"'":
+                self._string = []
+                self._quote = char
+            else:
+                self._token = []
+                continue
+            i += 1
+        self._offset += n
+
+    def finish(self) -> dict | None:
+        """Ends the response, closing whatever is still open.
+
+        Returns:
+            dict | None: The parsed object, or None if the response contains none.
+        """
+        if self.complete or not self._stack:
+            return self.value
+        if self._string is not None:
+            if self._closing is None:
+                self.repairs += 1  # Unterminated string
+            self._end_string()
+        if self._token is not None:
+            self._end_token()
+        while self._stack and not self.complete:
+            self.repairs += 1
+            self._close(type(self._stack[-1].container), self._offset)
+        return self.value
+
+    def _feed_string(self, chunk: str, i: int) -> int:
+        """Consumes the string being parsed from chunk[i:], returns the new index"""
+        if self._closing is not None:
+            # A quote is only the end of the string if a delimiter follows it
+            char = chunk[i]
+            if char in _WHITESPACE:
+                self._closing += char
+                return i + 1
+            if char in ",:}]":
+                self._end_string()
+                return i
+            self.repairs += 1
+            self._string.append(self._quote + self._closing)
+            self._closing = None
+            return i
+
+        if self._escape is not None:
+            return self._feed_escape(chunk, i)
+
+        if match := _STRING_RUNS[self._quote].match(chunk, i):
+            self._string.append(match.group())
+            return match.end()
+        if chunk[i] == "\\":
+            self._escape = ""
+        else:
+            self._closing = ""
+        return i + 1
+
+    def _feed_escape(self, chunk: str, i: int) -> int:
+        char = chunk[i]
+        if self._escape == "":
+            if char == "u":
+                self._escape = "u"
+                return i + 1
+            if char in _ESCAPES:
+                self._string.append(_ESCAPES[char])
+            else:
+                self.repairs += 1  # Invalid escape: keep it as it is
+                self._string.append("\\" + char)
+            self._escape = None
+            return i + 1
+
+        # Unicode escape: \uXXXX
+        if char in "0123456789abcdefABCDEF":
+            self._escape += char
+            if len(self._escape) == 5:
+                code = int(self._escape[1:], 16)
+                self._has_surrogates |= 0xD800 <= code <= 0xDFFF
+                self._string.append(chr(code))
+                self._escape = None
+            return i + 1
+        self.repairs += 1
+        self._string.append("\\" + self._escape)
+        self._escape = None
+        return i
+
+    def _end_string(self) -> None:
+        value = "".join(self._string)
+        if self._escape is not None:
+            value += "\\" + self._escape
+        if self._has_surrogates:
+            value = value.encode("utf-16", "surrogatepass").decode("utf-16", "replace")
+        if self._quote == "'":
+            self.repairs += 1
+        self._string = None
+        self._escape = None
+        self._closing = None
+        self._has_surrogates = False
+        self._value(value, is_string=True)
+
+    def _end_token(self) -> None:
+        token = "".join(self._token)
+        self._token = None
+        frame = self._stack[-1]
+        if isinstance(frame.container, dict) and frame.expects in ("key", "comma"):
+            # Unquoted key
+            self.repairs += 1
+            self._value(token, is_string=True)
+        elif token in _LITERALS:
+            if token not in ("true", "false", "null"):
+                self.repairs += 1
+            self._value(_LITERALS[token])
+        elif _NUMBER.fullmatch(token):
+            self._value(float(token) if any(c in token for c in ".eE") else int(token))
+        else:
+            # Unquoted string value
+            self.repairs += 1
+            self._value(token)
+
+    def _value(self, value: Any, is_string: bool = False) -> None:
+        """Adds a parsed value to the object or array being parsed"""
+        frame = self._stack[-1]
+        if isinstance(frame.container, list):
+            if frame.expects == "comma":
+                self.repairs += 1  # Missing comma
+            frame.container.append(value)
+            frame.expects = "comma"
+        elif frame.expects == "value":
+            frame.container[frame.key] = value
+            frame.expects = "comma"
+        elif frame.expects == "colon":
+            # Missing colon between the key and the value
+            self.repairs += 1
+            frame.container[frame.key] = value
+            frame.expects = "comma"
+        elif is_string:
+            if frame.expects == "comma":
+                self.repairs += 1  # Missing comma
+            frame.key = value
+            frame.expects = "colon"
+        else:
+            # A value where a key was expected can't be kept
+            self.repairs += 1
+
+    def _open(self, container: dict | list) -> None:
+        if self._stack:
+            self._value(container)
+        self._stack.append(_Frame(container))
+        self._open_counts[type(container)] += 1
+
+    def _close(self, container_type: type, position: int) -> None:
+        if not self._open_counts[container_type]:
+            self.repairs += 1  # Closing bracket without an opening one
+            return
+        while True:
+            frame = self._stack.pop()
+            self._open_counts[type(frame.container)] -= 1
+            if isinstance(frame.container, dict) and frame.expects in ("colon", "value"):
+                self.repairs += 1  # Key without a value
+            if isinstance(frame.container, container_type):
+                break
+            self.repairs += 1  # Unclosed bracket
+        if self._stack:
+            return
+
+        if not frame.container and self.repairs:
+            # Braces in prose rather than a JSON object; look for the next one
+            self.repairs = 0
+            self.start = None
+            return
+        self.value = frame.container
+        self.end = position + 1
+        self.complete = True
+
+    def _comma(self) -> None:
+        frame = self._stack[-1]
+        if frame.expects == "comma":
+            frame.expects = "key" if isinstance(frame.container, dict) else "value"
+        elif isinstance(frame.container, dict) and frame.expects in ("colon", "value"):
+            self.repairs += 1  # Key without a value
+            frame.expects = "key"
+
+    def _colon(self) -> None:
+        frame = self._stack[-1]
+        if frame.expects == "colon":
+            frame.expects = "value"
+        else:
+            self.repairs += 1
+
+
+def parse_json(text: str) -> dict | None:
+    """Parses the JSON object in an LLM response, tolerating common defects.
+
+    Args:
+        text (str): The response.
+
+    Returns:
+        dict | None: The parsed object, or None if the response contains none.
+    """
+    parser = JSONStreamParser()
+    parser.feed(text)
+    return parser.finish()
+
+
+class JSONObjectStream:
+    """
+    Receives a response as it is streamed and detects when its JSON object is
+    complete, so it can be parsed before the rest of the response arrives.
+
+    `feed` is called by the thread that consumes the stream; other threads can
+    `wait` for the object to be complete, or for the stream to be closed.
+    """
+
+    def __init__(self) -> None:
+        self.parser = JSONStreamParser()
+        self._chunks: list[str] = []
+        self._done = threading.Event()
+
+    @property
+    def complete(self) -> bool:
+        """Whether the JSON object of the response has been fully received"""
+        return self.parser.complete
+
+    @property
+    def text(self) -> str:
+        """The text received so far"""
+        return "".join(self._chunks)
+
+    @property
+    def object_text(self) -> str | None:
+        """The text of the JSON object, once it is complete"""
+        if not self.parser.complete:
+            return None
+        return self.text[self.parser.start : self.parser.end]
+
+    def feed(self, delta: str) -> None:
+        """Parses the next delta of the response"""
+        self._chunks.append(delta)
+        if not self.parser.complete:
+            self.parser.feed(delta)
+            if self.parser.complete:
+                self._done.set()
+
+    def close(self) -> None:
+        """Marks the end of the stream, whether or not an object was found"""
+        self._done.set()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Blocks until the object is complete or the stream is closed"""
+        return self._done.wait(timeout)
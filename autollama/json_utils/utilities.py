@@ -1,4 +1,5 @@
 """Utilities for the json_fixes package."""
+import functools
 import json
 import os.path
 import re
@@ -10,6 +11,15 @@ from autollama.logs import logger
 
 CFG = Config()
 LLM_DEFAULT_RESPONSE_FORMAT = "llm_response_format_1"
+# Response format listing several commands, used when PARALLEL_COMMANDS is set
+LLM_PARALLEL_RESPONSE_FORMAT = "llm_response_format_2"
+
+
+def get_response_format() -> str:
+    """Get the name of the schema that the agent's responses should follow."""
+    if CFG.parallel_commands:
+        return LLM_PARALLEL_RESPONSE_FORMAT
+    return LLM_DEFAULT_RESPONSE_FORMAT
 
 
 def extract_char_position(error_message: str) -> int:
@@ -30,18 +40,47 @@ def extract_char_position(error_message: str) -> int:
         raise ValueError("Character position not found in the error message.")
 
 
+@functools.lru_cache(maxsize=None)
+def get_schema_validator(schema_name: str) -> Draft7Validator:
+    """Get the validator of a JSON schema, loading and checking the schema once.
+
+    Args:
+        schema_name (str): The name of the schema file in json_utils, without
+          the .json extension.
+
+    Returns:
+        Draft7Validator: The validator of the schema.
+    """
+    scheme_file = os.path.join(os.path.dirname(__file__), f"{schema_name}.json")
+    with open(scheme_file, "r") as f:
+        schema = json.load(f)
+    Draft7Validator.check_schema(schema)
+    logger.debug(f"Loaded JSON schema {schema_name}")
+    return Draft7Validator(schema)
+
+
+def is_valid(json_object: object, schema_name: str) -> bool:
+    """Check a JSON object against a schema, stopping at the first error.
+
+    Args:
+        json_object (object): The JSON object to check.
+        schema_name (str): The name of the schema.
+
+    Returns:
+        bool: Whether the object is valid.
+    """
+    return get_schema_validator(schema_name).is_valid(json_object)
+
+
 def validate_json(json_object: object, schema_name: str) -> dict | None:
     """
     :type schema_name: object
     :param schema_name: str
     :type json_object: object
     """
-    scheme_file = os.path.join(os.path.dirname(__file__), f"{schema_name}.json")
-    with open(scheme_file, "r") as f:
-        schema = json.load(f)
-    validator = Draft7Validator(schema)
+    validator = get_schema_validator(schema_name)
 
-    if errors := sorted(validator.iter_errors(json_object), key=lambda e: e.path):
+    if not validator.is_valid(json_object):
         logger.error("The JSON object is invalid.")
         if CFG.debug_mode:
             logger.error(
@@ -49,7 +88,7 @@ def validate_json(json_object: object, schema_name: str) -> dict | None:
             )  # Replace 'json_object' with the variable containing the JSON data
             logger.error("The following issues were found:")
 
-            for error in errors:
+            for error in sorted(validator.iter_errors(json_object), key=lambda e: e.path):
                 logger.error(f"Error: {error.message}")
     else:
         logger.debug("The JSON object is valid.")
@@ -76,6 +115,13 @@ def is_string_valid_json(json_string: str, schema_name: str) -> bool:
     :type schema_name: object
     :param schema_name: str
     :type json_object: object
+
+    Only checks that the string parses as JSON, like validate_json_string: replies
+    that don't follow the schema are still valid.
     """
 
-    return validate_json_string(json_string, schema_name) is not None
+    try:
+        json.loads(json_string)
+        return True
+    except json.JSONDecodeError:
+        return False
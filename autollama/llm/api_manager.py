@@ -1,15 +1,27 @@
 from __future__ import annotations
 
-from typing import List, Optional
+import asyncio
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
 
-from groq import Groq
+from groq import AsyncGroq, Groq, RateLimitError
 
 from autollama.config import Config
 from autollama.llm.base import MessageDict
 from autollama.llm.modelsinfo import COSTS
+from autollama.llm.rate_limiter import RateLimiter
+from autollama.llm.response_cache import ResponseCache
+from autollama.llm.telemetry import CallRecord, CallTelemetry
 from autollama.logs import logger
 from autollama.singleton import Singleton
 
+# Tokens reserved for the reply of a request without max_tokens, until its usage is
+# known
+REPLY_TOKENS_ESTIMATE = 1000
+
 
 class ApiManager(metaclass=Singleton):
     def __init__(self):
@@ -17,6 +29,15 @@ class ApiManager(metaclass=Singleton):
         self.total_completion_tokens = 0
         self.total_cost = 0
         self.models: Optional[list[Model]] = None
+        self._lock = threading.Lock()
+        self._client: Optional[Groq] = None
+        self._response_cache: Optional[ResponseCache] = None
+        self._rate_limiter: Optional[RateLimiter] = None
+        self._telemetry: Optional[CallTelemetry] = None
+        # httpx async connection pools are bound to the event loop that uses them
+        self._async_clients: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, AsyncGroq
+        ] = weakref.WeakKeyDictionary()
 
     def reset(self):
         self.total_prompt_tokens = 0
@@ -24,12 +45,120 @@ class ApiManager(metaclass=Singleton):
         self.total_cost = 0
         self.models = None
 
+    @property
+    def client(self) -> Groq:
+        """The Groq client, shared by all calls to reuse HTTP connections"""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    # Retries are left to retry_groq_api and the rate limiter
+                    self._client = Groq(api_key=Config().groq_api_key, max_retries=0)
+        return self._client
+
+    @property
+    def async_client(self) -> AsyncGroq:
+        """The async Groq client of the running event loop"""
+        loop = asyncio.get_running_loop()
+        if (client := self._async_clients.get(loop)) is None:
+            client = AsyncGroq(api_key=Config().groq_api_key, max_retries=0)
+            self._async_clients[loop] = client
+        return client
+
+    @property
+    def rate_limiter(self) -> RateLimiter:
+        """The scheduler that keeps the calls of all threads within the rate limits"""
+        if self._rate_limiter is None:
+            cfg = Config()
+            with self._lock:
+                if self._rate_limiter is None:
+                    self._rate_limiter = RateLimiter(
+                        requests_per_minute=cfg.rate_limit_requests_per_minute,
+                        tokens_per_minute=cfg.rate_limit_tokens_per_minute,
+                        max_backoff=cfg.rate_limit_max_backoff,
+                    )
+        return self._rate_limiter
+
+    @property
+    def telemetry(self) -> CallTelemetry:
+        """The records of the latency and token usage of each call"""
+        if self._telemetry is None:
+            cfg = Config()
+            with self._lock:
+                if self._telemetry is None:
+                    self._telemetry = CallTelemetry(
+                        cfg.llm_telemetry_file,
+                        max_records=cfg.llm_telemetry_max_records,
+                    )
+        return self._telemetry
+
+    @property
+    def response_cache(self) -> Optional[ResponseCache]:
+        """The cache of deterministic responses, or None if it is disabled"""
+        cfg = Config()
+        if self._response_cache is None and cfg.llm_response_cache:
+            with self._lock:
+                if self._response_cache is None:
+                    self._response_cache = ResponseCache(
+                        cfg.llm_response_cache_path,
+                        ttl=cfg.llm_response_cache_ttl,
+                        max_entries=cfg.llm_response_cache_max_entries,
+                    )
+        return self._response_cache
+
+    def get_cached_response(
+        self,
+        messages: list[MessageDict],
+        model: str,
+        temperature: float,
+        max_tokens: int | None = None,
+    ) -> Optional[str]:
+        """
+        Get the cached response to a deterministic (temperature 0) request.
+        Args:
+        messages (list): The list of messages of the request.
+        model (str): The model of the request.
+        temperature (float): The temperature of the request.
+        max_tokens (int): The maximum number of tokens of the request.
+        Returns:
+        str: The cached response, or None if there is none.
+        """
+        if temperature != 0 or self.response_cache is None:
+            return None
+        key = ResponseCache.key(messages, model, temperature, max_tokens)
+        return self.response_cache.get(key)
+
+    def cache_response(
+        self,
+        messages: list[MessageDict],
+        model: str,
+        temperature: float,
+        max_tokens: int | None,
+        response: str,
+    ) -> None:
+        """Store the response to a deterministic (temperature 0) request."""
+        if temperature != 0 or self.response_cache is None:
+            return
+        key = ResponseCache.key(messages, model, temperature, max_tokens)
+        self.response_cache.set(key, response)
+
+    def get_response_cache_stats(self) -> dict[str, float]:
+        """
+        Get the hit-rate statistics of the response cache.
+
+        Returns:
+        dict: The cache statistics, empty if the cache is disabled.
+        """
+        if self.response_cache is None:
+            return {}
+        return self.response_cache.get_stats()
+
     def create_chat_completion(
         self,
         messages: list[MessageDict],
         model: str | None = None,
         temperature: float = None,
         max_tokens: int | None = None,
+        caller: str | None = None,
     ) -> str:
         """
         Create a chat completion and update the cost.
@@ -38,26 +167,190 @@ class ApiManager(metaclass=Singleton):
         model (str): The model to use for the API call.
         temperature (float): The temperature to use for the API call.
         max_tokens (int): The maximum number of tokens for the API call.
+        caller (str): What the call is for, e.g. "summarize", in the call records.
         Returns:
         str: The AI's response.
         """
-        cfg = Config()
-        client = Groq(api_key=cfg.groq_api_key)
+        estimate = self._estimate_tokens(messages, model, max_tokens)
+        record = self._new_record(model, caller)
+        record.queue_wait, reserved = self.rate_limiter.acquire(model, estimate)
+        start = time.perf_counter()
+        with self._request_errors(model, record, start, reserved):
+            raw_response = self.client.chat.completions.with_raw_response.create(
+                **self._completion_kwargs(messages, model, temperature, max_tokens)
+            )
+            self.rate_limiter.update(model, raw_response.headers)
+            response = raw_response.parse()
+        record.latency = record.time_to_first_token = time.perf_counter() - start
+        self._record_usage(response, model, reserved, record)
+        return response
+
+    def create_chat_completion_stream(
+        self,
+        messages: list[MessageDict],
+        model: str | None = None,
+        temperature: float = None,
+        max_tokens: int | None = None,
+        caller: str | None = None,
+    ) -> Iterator[str]:
+        """
+        Create a streamed chat completion and update the cost once it is done.
+
+        The request is sent right away, so API errors are raised by this call; the
+        returned iterator yields the content deltas of the response as they arrive.
+        Args:
+        messages (list): The list of messages to send to the API.
+        model (str): The model to use for the API call.
+        temperature (float): The temperature to use for the API call.
+        max_tokens (int): The maximum number of tokens for the API call.
+        caller (str): What the call is for, e.g. "agent_cycle", in the call records.
+        Returns:
+        Iterator[str]: The deltas of the AI's response.
+        """
+        estimate = self._estimate_tokens(messages, model, max_tokens)
+        record = self._new_record(model, caller)
+        record.streamed = True
+        record.queue_wait, reserved = self.rate_limiter.acquire(model, estimate)
+        start = time.perf_counter()
+        with self._request_errors(model, record, start, reserved):
+            raw_response = self.client.chat.completions.with_raw_response.create(
+                **self._completion_kwargs(messages, model, temperature, max_tokens),
+                stream=True,
+            )
+            self.rate_limiter.update(model, raw_response.headers)
+            stream = raw_response.parse()
+        return self._iter_stream(stream, model, reserved, record, start)
+
+    def _iter_stream(
+        self, stream, model: str, reserved: float, record: CallRecord, start: float
+    ) -> Iterator[str]:
+        usage = None
+        try:
+            for chunk in stream:
+                if chunk.choices and (delta := chunk.choices[0].delta.content):
+                    if record.time_to_first_token is None:
+                        record.time_to_first_token = time.perf_counter() - start
+                    yield delta
+                # Groq reports the usage of the whole completion in the last chunk
+                if chunk.x_groq is not None and chunk.x_groq.usage is not None:
+                    usage = chunk.x_groq.usage
+                elif getattr(chunk, "usage", None) is not None:
+                    usage = chunk.usage
+        except Exception as e:
+            record.error = _describe_error(e)
+            raise
+        finally:
+            stream.close()
+            record.latency = time.perf_counter() - start
+            if usage is not None:
+                record.prompt_tokens = usage.prompt_tokens
+                record.completion_tokens = usage.completion_tokens
+            self.telemetry.add(record)
+
+        if usage is None:
+            logger.warn(f"No token usage reported for streamed completion by {model}")
+            return
+        logger.debug("Streamed response usage: %s", usage, subsystem="llm")
+        self.update_cost(usage.prompt_tokens, usage.completion_tokens, model)
+        self.rate_limiter.settle(model, reserved, usage.total_tokens)
+
+    async def acreate_chat_completion(
+        self,
+        messages: list[MessageDict],
+        model: str | None = None,
+        temperature: float = None,
+        max_tokens: int | None = None,
+        caller: str | None = None,
+    ) -> str:
+        """
+        Create a chat completion asynchronously and update the cost.
+        Args:
+        messages (list): The list of messages to send to the API.
+        model (str): The model to use for the API call.
+        temperature (float): The temperature to use for the API call.
+        max_tokens (int): The maximum number of tokens for the API call.
+        caller (str): What the call is for, e.g. "summarize", in the call records.
+        Returns:
+        str: The AI's response.
+        """
+        estimate = self._estimate_tokens(messages, model, max_tokens)
+        record = self._new_record(model, caller)
+        record.queue_wait, reserved = await self.rate_limiter.acquire_async(
+            model, estimate
+        )
+        start = time.perf_counter()
+        with self._request_errors(model, record, start, reserved):
+            raw_response = await self.async_client.chat.completions.with_raw_response.create(
+                **self._completion_kwargs(messages, model, temperature, max_tokens)
+            )
+            self.rate_limiter.update(model, raw_response.headers)
+            response = await raw_response.parse()
+        record.latency = record.time_to_first_token = time.perf_counter() - start
+        self._record_usage(response, model, reserved, record)
+        return response
+
+    def _completion_kwargs(
+        self,
+        messages: list[MessageDict],
+        model: str | None,
+        temperature: float | None,
+        max_tokens: int | None,
+    ) -> dict:
         if temperature is None:
-            temperature = cfg.temperature
-      
-        response = client.chat.completions.create(
-            model=model,
-            messages=messages,
-            temperature=temperature,
-            max_tokens=max_tokens,
+            temperature = Config().temperature
+        return {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+        }
+
+    def _estimate_tokens(
+        self, messages: list[MessageDict], model: str, max_tokens: int | None
+    ) -> int:
+        """Estimates the tokens a request counts against the tokens per minute limit"""
+        from autollama.llm.utils.token_counter import count_string_tokens
+
+        prompt_tokens = sum(
+            4 + count_string_tokens(message["content"], model) for message in messages
         )
+        return prompt_tokens + (max_tokens or REPLY_TOKENS_ESTIMATE)
+
+    def _new_record(self, model: str, caller: str | None) -> CallRecord:
+        return CallRecord(model=model, caller=caller or "other", started_at=time.time())
+
+    @contextmanager
+    def _request_errors(
+        self, model: str, record: CallRecord, start: float, reserved: float
+    ):
+        """Records failed requests and releases their token reservation, and pauses
+        the model for all callers when the server rate-limits a request"""
+        try:
+            yield
+        except Exception as e:
+            self.rate_limiter.release(model, reserved)
+            if isinstance(e, RateLimitError):
+                hint = self.rate_limiter.rate_limited(model, e.response.headers)
+                logger.debug(f"Rate limited by the API for {model}, reset in {hint}s")
+            record.error = _describe_error(e)
+            record.latency = time.perf_counter() - start
+            self.telemetry.add(record)
+            raise
+
+    def _record_usage(
+        self, response, model: str, reserved: float, record: CallRecord
+    ) -> None:
         if not hasattr(response, "error"):
-            logger.debug(f"Response: {response}")
+            logger.debug("Response: %s", response, subsystem="llm")
             prompt_tokens = response.usage.prompt_tokens
             completion_tokens = response.usage.completion_tokens
             self.update_cost(prompt_tokens, completion_tokens, model)
-        return response
+            self.rate_limiter.settle(
+                model, reserved, prompt_tokens + completion_tokens
+            )
+            record.prompt_tokens = prompt_tokens
+            record.completion_tokens = completion_tokens
+        self.telemetry.add(record)
 
     def update_cost(self, prompt_tokens, completion_tokens, model: str):
         """
@@ -69,13 +362,18 @@ class ApiManager(metaclass=Singleton):
         model (str): The model used for the API call.
         """
         model = model[:-3] if model.endswith("-v2") else model
+        costs = COSTS.get(model)
+        if costs is None:
+            logger.debug(f"No known cost for model {model}, counting it as free")
+            costs = {"prompt": 0.0, "completion": 0.0}
 
-        self.total_prompt_tokens += prompt_tokens
-        self.total_completion_tokens += completion_tokens
-        self.total_cost += (
-            prompt_tokens * COSTS[model]["prompt"]
-            + completion_tokens * COSTS[model]["completion"]
-        ) / 1000
+        # Completions may be created concurrently, e.g. when summarizing chunks
+        with self._lock:
+            self.total_prompt_tokens += prompt_tokens
+            self.total_completion_tokens += completion_tokens
+            self.total_cost += (
+                prompt_tokens * costs["prompt"] + completion_tokens * costs["completion"]
+            ) / 1000
         logger.debug(f"Total running cost: ${self.total_cost:.3f}")
 
 
@@ -107,6 +405,44 @@ class ApiManager(metaclass=Singleton):
         return self.total_cost
 
 
+    def get_call_records(
+        self,
+        caller: str | None = None,
+        model: str | None = None,
+        since: float | None = None,
+    ) -> list[CallRecord]:
+        """
+        Get the records of the latest calls, optionally filtered.
+
+        Args:
+        caller (str): Only the calls made for this, e.g. "summarize".
+        model (str): Only the calls to this model.
+        since (float): Only the calls started after this timestamp.
+
+        Returns:
+        list: The matching call records, oldest first.
+        """
+        return self.telemetry.query(caller=caller, model=model, since=since)
+
+    def get_call_stats(self, group_by: str = "caller") -> dict[str, dict[str, float]]:
+        """
+        Get the latency and token usage of the latest calls, by caller or model.
+
+        Returns:
+        dict: The call count, errors, tokens, mean queue wait and p50/p95 latency
+        and time to first token of each group.
+        """
+        return self.telemetry.summary(group_by=group_by)
+
+    def export_call_records(self, path: str) -> int:
+        """
+        Export the records of the latest calls to a JSONL file.
+
+        Returns:
+        int: The number of records exported.
+        """
+        return self.telemetry.export(path)
+
     def get_models(self) -> List[Model]:
         """
         Get list of available Llama models.
@@ -118,3 +454,9 @@ class ApiManager(metaclass=Singleton):
         if self.models is None:
             all_models = ["llama3-8b-8192"]
         return self.models
+
+
+def _describe_error(error: Exception) -> str:
+    status_code = getattr(error, "status_code", None)
+    name = type(error).__name__
+    return f"{name} ({status_code})" if status_code is not None else name
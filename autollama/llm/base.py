@@ -20,6 +20,10 @@ class Message:
     role: MessageRole
     content: str
     type: MessageType | None = None
+    # ((model, role, content), token count) of the last count of this message
+    _token_count: tuple[tuple[str, str, str], int] | None = field(
+        default=None, init=False, repr=False, compare=False
+    )
 
     def raw(self) -> MessageDict:
         return {"role": self.role, "content": self.content}
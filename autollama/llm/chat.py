@@ -1,7 +1,8 @@
 from __future__ import annotations
 
+import logging
 import time
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Callable
 
 if TYPE_CHECKING:
     from autollama.agent.agent import Agent
@@ -9,8 +10,13 @@ if TYPE_CHECKING:
 from autollama.config import Config
 from autollama.llm.api_manager import ApiManager
 from autollama.llm.base import ChatSequence, Message
-from autollama.llm.utils import count_message_tokens, create_chat_completion
+from autollama.llm.utils import (
+    count_message_tokens,
+    create_chat_completion,
+    stream_chat_completion,
+)
 from autollama.log_cycle.log_cycle import CURRENT_CONTEXT_FILE_NAME
+from autollama.log_cycle.profiler import profiler
 from autollama.logs import logger
 
 
@@ -22,6 +28,7 @@ def chat_with_ai(
     user_input: str,
     token_limit: int,
     model: str | None = None,
+    on_delta: Callable[[str], None] | None = None,
 ):
     """
     Interact with the Groq API, sending the prompt, user input,
@@ -34,15 +41,18 @@ def chat_with_ai(
         user_input (str): The input from the user.
         token_limit (int): The maximum number of tokens allowed in the API call.
         model (str, optional): The model to use. If None, the config.fast_llm_model will be used. Defaults to None.
+        on_delta (Callable, optional): If set, the response is streamed and each
+            delta is passed to this function as it arrives. Defaults to None.
 
     Returns:
     str: The AI's response.
     """
     if model is None:
         model = config.llm_model
+    context_span = profiler.span("context").start()
 
     # Reserve 1000 tokens for the response
-    logger.debug(f"Token limit: {token_limit}")
+    logger.debug("Token limit: %d", token_limit, subsystem="llm")
     send_token_limit = token_limit - 1000
 
     # if len(agent.history) == 0:
@@ -96,15 +106,14 @@ def chat_with_ai(
     current_tokens_used += 500  # Reserve space for new_summary_message
 
     # Add Messages until the token limit is reached or there are no more messages to add.
-    for cycle in reversed(list(agent.history.per_cycle())):
-        messages_to_add = [msg for msg in cycle if msg is not None]
-        tokens_to_add = count_message_tokens(messages_to_add, model)
+    for cycle in reversed(agent.history.cycles()):
+        tokens_to_add = cycle.token_length(model)
         if current_tokens_used + tokens_to_add > send_token_limit:
             break
 
         # Add the most recent message to the start of the chain,
         #  after the system prompts.
-        message_sequence.insert(insertion_index, *messages_to_add)
+        message_sequence.insert(insertion_index, *cycle.messages)
         current_tokens_used += tokens_to_add
 
     # Update & add summary of trimmed messages
@@ -135,17 +144,21 @@ def chat_with_ai(
     # assert tokens_remaining >= 0, "Tokens remaining is negative.
 
     # Debug print the current context
-    logger.debug(f"Token limit: {token_limit}")
-    logger.debug(f"Send Token Count: {current_tokens_used}")
-    logger.debug(f"Tokens remaining for response: {tokens_remaining}")
-    logger.debug("------------ CONTEXT SENT TO AI ---------------")
-    for message in message_sequence:
-        # Skip printing the prompt
-        if message.role == "system" and message.content == system_prompt:
-            continue
-        logger.debug(f"{message.role.capitalize()}: {message.content}")
-        logger.debug("")
-    logger.debug("----------- END OF CONTEXT ----------------")
+    if logger.is_enabled_for(logging.DEBUG, "llm"):
+        logger.debug("Token limit: %d", token_limit, subsystem="llm")
+        logger.debug("Send Token Count: %d", current_tokens_used, subsystem="llm")
+        logger.debug("Tokens remaining for response: %d", tokens_remaining, subsystem="llm")
+        logger.debug("------------ CONTEXT SENT TO AI ---------------", subsystem="llm")
+        for message in message_sequence:
+            # Skip printing the prompt
+            if message.role == "system" and message.content == system_prompt:
+                continue
+            logger.debug(
+                "%s: %s", message.role.capitalize(), message.content, subsystem="llm"
+            )
+            logger.debug("", subsystem="llm")
+        logger.debug("----------- END OF CONTEXT ----------------", subsystem="llm")
+    context_span.stop()
     agent.log_cycle_handler.log_cycle(
         agent.config.ai_name,
         agent.created_at,
@@ -156,10 +169,24 @@ def chat_with_ai(
 
     # TODO: use a model defined elsewhere, so that model can contain
     # temperature and other settings we care about
-    assistant_reply = create_chat_completion(
-        prompt=message_sequence,
-        max_tokens=tokens_remaining,
-    )
+    llm_span = profiler.span("llm").start()
+    if on_delta is None:
+        assistant_reply = create_chat_completion(
+            prompt=message_sequence,
+            max_tokens=tokens_remaining,
+            caller="agent_cycle",
+        )
+    else:
+        deltas = []
+        for delta in stream_chat_completion(
+            prompt=message_sequence,
+            max_tokens=tokens_remaining,
+            caller="agent_cycle",
+        ):
+            deltas.append(delta)
+            on_delta(delta)
+        assistant_reply = "".join(deltas)
+    llm_span.stop()
 
     # Update full message history
     agent.history.append(user_input_msg)
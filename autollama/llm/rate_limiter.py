@@ -0,0 +1,239 @@
+"""Client-side scheduling of LLM calls within the rate limits of the Groq API"""
+from __future__ import annotations
+
+import asyncio
+import random
+import re
+import threading
+import time
+from typing import Mapping, Optional
+
+from autollama.logs import logger
+
+# Reset hints are durations such as "2m59.56s", "7.66s" or "120ms"
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Parses a rate limit reset hint into seconds, or None if there is none"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def retry_after(headers: Mapping[str, str]) -> Optional[float]:
+    """Gets how long the server asks to wait before the next request, if it says"""
+    hints = [
+        parse_duration(headers.get("retry-after")),
+        parse_duration(headers.get("x-ratelimit-reset-tokens"))
+        if headers.get("x-ratelimit-remaining-tokens") == "0"
+        else None,
+        parse_duration(headers.get("x-ratelimit-reset-requests"))
+        if headers.get("x-ratelimit-remaining-requests") == "0"
+        else None,
+    ]
+    hints = [hint for hint in hints if hint is not None]
+    return max(hints) if hints else None
+
+
+class TokenBucket:
+    """
+    Bucket holding up to `capacity` units, refilled at `capacity` units per `period`.
+
+    Callers reserve units rather than waiting for them to be available: the level
+    may go below zero, and the debt is how long the next caller has to wait. So
+    callers are served in the order they arrive, and none of them can starve.
+    """
+
+    def __init__(self, capacity: float, period: float = 60.0) -> None:
+        self.capacity = capacity
+        self.period = period
+        self.level = capacity
+        self.updated = time.monotonic()
+
+    @property
+    def rate(self) -> float:
+        return self.capacity / self.period
+
+    def reserve(self, amount: float, now: float) -> tuple[float, float]:
+        """
+        Takes `amount` units.
+
+        Returns:
+            tuple[float, float]: The delay until the units are actually available, and
+                the units taken, which are capped at the capacity so that a request
+                larger than the bucket can still go through once it is full.
+        """
+        self._refill(now)
+        taken = min(amount, self.capacity)
+        self.level -= taken
+        return max(0.0, -self.level / self.rate), taken
+
+    def refund(self, amount: float, now: float) -> None:
+        """Gives back units that were reserved but not used, or takes extra ones"""
+        self._refill(now)
+        self.level = min(self.capacity, self.level + amount)
+
+    def sync(self, capacity: Optional[float], remaining: Optional[float], now: float):
+        """Adjusts the bucket to the limits reported by the server"""
+        self._refill(now)
+        if capacity:
+            self.level += capacity - self.capacity
+            self.capacity = capacity
+        if remaining is not None:
+            self.level = min(self.level, remaining)
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+
+class _ModelLimits:
+    __slots__ = ("requests", "tokens", "blocked_until")
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int) -> None:
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        # Until when the server asked us not to send requests
+        self.blocked_until = 0.0
+
+
+class RateLimiter:
+    """
+    Schedules the LLM calls of all threads so that each model stays within its
+    requests per minute and tokens per minute.
+
+    Every call reserves a request and its estimated tokens before it is sent, and
+    waits for as long as the buckets of its model are in debt; callers are served
+    first come, first served. The buckets start from the configured limits and
+    follow the limits and remaining quota the server reports in its response
+    headers. When the server rate-limits a request anyway, the model is paused
+    until the reset time it gives, for all callers at once.
+    """
+
+    def __init__(
+        self, requests_per_minute: int, tokens_per_minute: int, max_backoff: float
+    ) -> None:
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_backoff = max_backoff
+        self._limits: dict[str, _ModelLimits] = {}
+        self._lock = threading.Lock()
+
+    def reserve(self, model: str, tokens: int) -> tuple[float, float]:
+        """
+        Reserves a request and its tokens.
+
+        Returns:
+            tuple[float, float]: How long to wait before sending the request, and the
+                tokens actually reserved, to settle once its usage is known.
+        """
+        now = time.monotonic()
+        with self._lock:
+            limits = self._get_limits(model)
+            request_delay, _ = limits.requests.reserve(1, now)
+            token_delay, reserved = limits.tokens.reserve(tokens, now)
+            return (
+                max(request_delay, token_delay, limits.blocked_until - now),
+                reserved,
+            )
+
+    def acquire(self, model: str, tokens: int) -> tuple[float, float]:
+        """Blocks until a request with `tokens` tokens can be sent, returns the wait
+        and the tokens reserved"""
+        delay, reserved = self.reserve(model, tokens)
+        if delay > 0:
+            logger.debug(f"Rate limit: waiting {delay:.2f}s for {model}")
+            time.sleep(delay)
+        return delay, reserved
+
+    async def acquire_async(self, model: str, tokens: int) -> tuple[float, float]:
+        """Same as acquire, without blocking the event loop"""
+        delay, reserved = self.reserve(model, tokens)
+        if delay > 0:
+            logger.debug(f"Rate limit: waiting {delay:.2f}s for {model}")
+            await asyncio.sleep(delay)
+        return delay, reserved
+
+    def release(self, model: str, reserved: float) -> None:
+        """Gives back the tokens reserved for a request that failed"""
+        self.settle(model, reserved, 0)
+
+    def settle(self, model: str, reserved: float, used: int) -> None:
+        """Corrects the token reservation of a request with its actual usage.
+
+        `reserved` is the amount returned by reserve, not the estimate it was given.
+        """
+        with self._lock:
+            self._get_limits(model).tokens.refund(reserved - used, time.monotonic())
+
+    def update(self, model: str, headers: Mapping[str, str]) -> None:
+        """Follows the rate limits reported in the headers of a response"""
+        now = time.monotonic()
+        with self._lock:
+            limits = self._get_limits(model)
+            limits.tokens.sync(
+                _header_number(headers, "x-ratelimit-limit-tokens"),
+                _header_number(headers, "x-ratelimit-remaining-tokens"),
+                now,
+            )
+            # The request limit is per day rather than per minute, so it only
+            # matters once it is exhausted; the configured requests per minute
+            # still apply until then
+            if headers.get("x-ratelimit-remaining-requests") == "0":
+                reset = parse_duration(headers.get("x-ratelimit-reset-requests"))
+                limits.blocked_until = max(limits.blocked_until, now + (reset or 0))
+
+    def rate_limited(self, model: str, headers: Mapping[str, str]) -> Optional[float]:
+        """Pauses the model after a rate limit error, returns the server's reset hint"""
+        hint = retry_after(headers)
+        if hint is not None:
+            with self._lock:
+                limits = self._get_limits(model)
+                limits.blocked_until = max(
+                    limits.blocked_until, time.monotonic() + min(hint, self.max_backoff)
+                )
+        return hint
+
+    def backoff(
+        self, attempt: int, base: float = 2.0, hint: Optional[float] = None
+    ) -> float:
+        """
+        Gets the delay before retrying a failed request.
+
+        Args:
+            attempt (int): The number of the attempt that failed, from 1.
+            base (float): Base of the exponential backoff.
+            hint (float, optional): How long the server asked to wait, if it did.
+
+        Returns:
+            float: The delay, with jitter so that callers don't retry in lockstep,
+                and capped at `max_backoff`.
+        """
+        if hint is not None:
+            delay = hint + random.uniform(0, 1)
+        else:
+            delay = min(self.max_backoff, base**attempt)
+            delay = delay / 2 + random.uniform(0, delay / 2)
+        return min(self.max_backoff, delay)
+
+    def _get_limits(self, model: str) -> _ModelLimits:
+        if (limits := self._limits.get(model)) is None:
+            limits = _ModelLimits(self.requests_per_minute, self.tokens_per_minute)
+            self._limits[model] = limits
+        return limits
+
+
+def _header_number(headers: Mapping[str, str], name: str) -> Optional[float]:
+    try:
+        return float(headers[name])
+    except (KeyError, ValueError):
+        return None
@@ -0,0 +1,124 @@
+"""On-disk cache for the responses of deterministic LLM calls"""
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from autollama.llm.base import MessageDict
+from autollama.logs import logger
+
+
+class ResponseCache:
+    """
+    Cache of chat completion responses, keyed by a hash of the model, the messages,
+    the temperature and max_tokens of the request.
+
+    Responses are stored in an sqlite database so they survive across runs.
+    Entries expire `ttl` seconds after they were stored, and once the cache holds
+    more than `max_entries` responses the least recently used ones are evicted.
+    """
+
+    def __init__(self, path: str | Path, ttl: float, max_entries: int) -> None:
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS responses_accessed_at "
+            "ON responses (accessed_at)"
+        )
+        self._db.commit()
+        logger.debug(f"Opened LLM response cache at {self.path}")
+
+    @staticmethod
+    def key(
+        messages: list[MessageDict],
+        model: str,
+        temperature: float,
+        max_tokens: Optional[int],
+    ) -> str:
+        request = json.dumps(
+            [model, messages, temperature, max_tokens],
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(request.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Returns the cached response for the key, or None if missing or expired"""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._db.commit()
+                    self.evictions += 1
+                self.misses += 1
+                return None
+
+            self._db.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self._db.commit()
+            self.hits += 1
+            return row[0]
+
+    def set(self, key: str, response: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, response, created_at, accessed_at)"
+                " VALUES (?, ?, ?, ?)",
+                (key, response, now, now),
+            )
+            self._evict(now)
+            self._db.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+
+    def get_stats(self) -> dict[str, float]:
+        """Returns the hit/miss counters, the hit rate and the number of entries"""
+        with self._lock:
+            (n_entries,) = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": n_entries,
+        }
+
+    def _evict(self, now: float) -> None:
+        """Drops expired entries, then the least recently used ones over the limit"""
+        expired = self._db.execute(
+            "DELETE FROM responses WHERE created_at < ?", (now - self.ttl,)
+        ).rowcount
+        over_limit = self._db.execute(
+            "DELETE FROM responses WHERE key IN ("
+            "SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        ).rowcount
+        self.evictions += expired + over_limit
@@ -0,0 +1,128 @@
+"""Per-call latency and token usage records of the LLM calls"""
+from __future__ import annotations
+
+import json
+import threading
+from collections import deque
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from statistics import quantiles
+from typing import Iterable, Optional
+
+from autollama.logs import logger
+
+
+@dataclass
+class CallRecord:
+    """
+    The timings and token usage of one request to the API.
+
+    Times are in seconds. `queue_wait` is the time spent waiting for the rate
+    limiter; `latency` runs from sending the request to receiving the last token.
+    Without streaming, the first token arrives with the others, so
+    `time_to_first_token` equals `latency`.
+    """
+
+    model: str
+    caller: str
+    started_at: float
+    queue_wait: float = 0.0
+    time_to_first_token: Optional[float] = None
+    latency: Optional[float] = None
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    streamed: bool = False
+    error: Optional[str] = None
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+
+class CallTelemetry:
+    """
+    Keeps the records of the latest `max_records` calls in memory, and appends each
+    record to a JSONL file as it completes if a path is given.
+    """
+
+    def __init__(self, path: Optional[str | Path], max_records: int) -> None:
+        self.path = Path(path) if path else None
+        self._records: deque[CallRecord] = deque(maxlen=max_records)
+        self._lock = threading.Lock()
+        self._file = None
+
+    def add(self, record: CallRecord) -> None:
+        with self._lock:
+            self._records.append(record)
+            if self.path is not None:
+                try:
+                    if self._file is None:
+                        self.path.parent.mkdir(parents=True, exist_ok=True)
+                        self._file = open(self.path, "a", encoding="utf-8")
+                    self._file.write(json.dumps(asdict(record)) + "\n")
+                    self._file.flush()
+                except OSError as e:
+                    logger.warn(f"Could not write LLM call record to {self.path}: {e}")
+                    self.path = None
+
+    def query(
+        self,
+        caller: Optional[str] = None,
+        model: Optional[str] = None,
+        since: Optional[float] = None,
+    ) -> list[CallRecord]:
+        """Returns the records of the calls matching all the given filters"""
+        with self._lock:
+            records = list(self._records)
+        return [
+            record
+            for record in records
+            if (caller is None or record.caller == caller)
+            and (model is None or record.model == model)
+            and (since is None or record.started_at >= since)
+        ]
+
+    def summary(self, group_by: str = "caller") -> dict[str, dict[str, float]]:
+        """
+        Aggregates the records by caller or model.
+
+        Returns:
+            dict: For each group, the number of calls and errors, the total tokens,
+                the mean queue wait and the p50/p95 latency and time to first token.
+        """
+        groups: dict[str, list[CallRecord]] = {}
+        for record in self.query():
+            groups.setdefault(getattr(record, group_by), []).append(record)
+
+        return {
+            name: {
+                "calls": len(records),
+                "errors": sum(record.error is not None for record in records),
+                "prompt_tokens": sum(record.prompt_tokens for record in records),
+                "completion_tokens": sum(record.completion_tokens for record in records),
+                "mean_queue_wait": sum(r.queue_wait for r in records) / len(records),
+                **_percentiles("latency", (r.latency for r in records)),
+                **_percentiles(
+                    "time_to_first_token", (r.time_to_first_token for r in records)
+                ),
+            }
+            for name, records in groups.items()
+        }
+
+    def export(self, path: str | Path) -> int:
+        """Writes the records in memory to a JSONL file, returns how many there are"""
+        records = self.query()
+        with open(path, "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(asdict(record)) + "\n")
+        return len(records)
+
+
+def _percentiles(name: str, values: Iterable[Optional[float]]) -> dict[str, float]:
+    values = [value for value in values if value is not None]
+    if not values:
+        return {}
+    if len(values) == 1:
+        return {f"{name}_p50": values[0], f"{name}_p95": values[0]}
+    cuts = quantiles(values, n=20, method="inclusive")
+    return {f"{name}_p50": cuts[9], f"{name}_p95": cuts[18]}
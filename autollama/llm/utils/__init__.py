@@ -1,19 +1,21 @@
 from __future__ import annotations
 
+import asyncio
 import functools
+import inspect
 import time
-from typing import List, Literal, Optional
+from typing import Iterator, List, Literal, Optional
 from unittest.mock import patch
 
 from colorama import Fore, Style
-from groq import APIError, RateLimitError
-from groq import Groq
+from groq import APIConnectionError, APIError, APIStatusError, RateLimitError
 
 from autollama.config import Config
 from autollama.logs import logger
 
 from ..api_manager import ApiManager
 from ..base import ChatSequence, Message
+from ..rate_limiter import retry_after
 from .token_counter import *
 
 
@@ -24,6 +26,10 @@ def retry_groq_api(
 ):
     """Retry an Groq API call.
 
+    Rate limit errors, bad gateways, overloaded servers and connection errors are
+    retried after the reset time given by the server, or else a jittered exponential
+    backoff capped at RATE_LIMIT_MAX_BACKOFF.
+
     Args:
         num_retries int: Number of retries. Defaults to 10.
         backoff_base float: Base for exponential backoff. Defaults to 2.
@@ -35,33 +41,56 @@ def retry_groq_api(
         f"{Fore.CYAN + Style.BRIGHT}PAID{Style.RESET_ALL} Groq API Account."
     )
     backoff_msg = (
-        f"{Fore.RED}Error: API Bad gateway. Waiting {{backoff}} seconds...{Fore.RESET}"
+        f"{Fore.RED}Error: API Bad gateway. Waiting {{backoff:.1f}} seconds...{Fore.RESET}"
     )
 
+    def _backoff_or_raise(error: APIError, attempt: int, num_attempts: int) -> float:
+        """Re-raise the error if the call shouldn't be retried, else get the backoff"""
+        if isinstance(error, RateLimitError):
+            if attempt == num_attempts:
+                raise error
+            logger.debug(retry_limit_msg)
+        elif not _is_retryable(error) or (attempt == num_attempts):
+            raise error
+
+        hint = None
+        if isinstance(error, APIStatusError):
+            hint = retry_after(error.response.headers)
+        backoff = ApiManager().rate_limiter.backoff(attempt, backoff_base, hint)
+        logger.debug(backoff_msg.format(backoff=backoff))
+        return backoff
+
     def _wrapper(func):
+        num_attempts = num_retries + 1  # +1 for the first attempt
+
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def _async_wrapped(*args, **kwargs):
+                user_warned = not warn_user
+                for attempt in range(1, num_attempts + 1):
+                    try:
+                        return await func(*args, **kwargs)
+                    except APIError as e:
+                        backoff = _backoff_or_raise(e, attempt, num_attempts)
+                        if isinstance(e, RateLimitError) and not user_warned:
+                            logger.double_check(api_key_error_msg)
+                            user_warned = True
+                    await asyncio.sleep(backoff)
+
+            return _async_wrapped
+
         @functools.wraps(func)
         def _wrapped(*args, **kwargs):
             user_warned = not warn_user
-            num_attempts = num_retries + 1  # +1 for the first attempt
             for attempt in range(1, num_attempts + 1):
                 try:
                     return func(*args, **kwargs)
-
-                except RateLimitError:
-                    if attempt == num_attempts:
-                        raise
-
-                    logger.debug(retry_limit_msg)
-                    if not user_warned:
+                except APIError as e:
+                    backoff = _backoff_or_raise(e, attempt, num_attempts)
+                    if isinstance(e, RateLimitError) and not user_warned:
                         logger.double_check(api_key_error_msg)
                         user_warned = True
-
-                except APIError as e:
-                    if (e.message not in [502, 429]) or (attempt == num_attempts):
-                        raise
-
-                backoff = backoff_base ** (attempt + 2)
-                logger.debug(backoff_msg.format(backoff=backoff))
                 time.sleep(backoff)
 
         return _wrapped
@@ -69,12 +98,19 @@ def retry_groq_api(
     return _wrapper
 
 
+def _is_retryable(error: APIError) -> bool:
+    if isinstance(error, APIConnectionError):
+        return True
+    return getattr(error, "status_code", None) in (429, 502, 503)
+
+
 def call_ai_function(
     function: str,
     args: list,
     description: str,
     model: str | None = None,
     config: Config = None,
+    caller: str = "ai_function",
 ) -> str:
     """Call an AI function
 
@@ -85,6 +121,7 @@ def call_ai_function(
         args (list): The arguments to pass to the function
         description (str): The description of the function
         model (str, optional): The model to use. Defaults to None.
+        caller (str, optional): What the call is for, in the call records.
 
     Returns:
         str: The response from the function
@@ -107,7 +144,7 @@ def call_ai_function(
             Message("user", arg_str),
         ],
     )
-    return create_chat_completion(prompt=prompt, temperature=0)
+    return create_chat_completion(prompt=prompt, temperature=0, caller=caller)
 
 
 @retry_groq_api()
@@ -118,7 +155,6 @@ def create_text_completion(
     max_output_tokens: Optional[int],
 ) -> str:
     cfg = Config()
-    client = Groq(api_key=cfg.groq_api_key)
     if model is None:
         model = cfg.llm_model
     if temperature is None:
@@ -126,7 +162,7 @@ def create_text_completion(
 
     kwargs = {"model": model}
 
-    response = client.chat.completions.create(
+    response = ApiManager().client.chat.completions.create(
         **kwargs,
         prompt=prompt,
         temperature=temperature,
@@ -143,6 +179,7 @@ def create_chat_completion(
     model: Optional[str] = None,
     temperature: float = None,
     max_tokens: Optional[int] = None,
+    caller: Optional[str] = None,
 ) -> str:
     """Create a chat completion using the Groq API
 
@@ -151,6 +188,8 @@ def create_chat_completion(
         model (str, optional): The model to use. Defaults to None.
         temperature (float, optional): The temperature to use. Defaults to 0.9.
         max_tokens (int, optional): The max tokens to use. Defaults to None.
+        caller (str, optional): What the call is for, e.g. "summarize", in the call
+            records. Defaults to None.
 
     Returns:
         str: The response from the chat completion
@@ -167,17 +206,142 @@ def create_chat_completion(
   
     api_manager = ApiManager()
     response = None
+    messages = prompt.raw()
+
+    cached = api_manager.get_cached_response(messages, model, temperature, max_tokens)
+    if cached is not None:
+        logger.debug("Using cached chat completion")
+        return cached
 
     kwargs = {"model": model}
 
     response = api_manager.create_chat_completion(
         **kwargs,
-        messages=prompt.raw(),
+        messages=messages,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        caller=caller,
+    )
+
+    resp = response.choices[0].message.content
+    api_manager.cache_response(messages, model, temperature, max_tokens, resp)
+    return resp
+
+
+@retry_groq_api()
+def stream_chat_completion(
+    prompt: ChatSequence,
+    model: Optional[str] = None,
+    temperature: float = None,
+    max_tokens: Optional[int] = None,
+    caller: Optional[str] = None,
+) -> Iterator[str]:
+    """Create a chat completion using the Groq API, streaming the response
+
+    Same as create_chat_completion, but yields the deltas of the response as they
+    are generated. Joined together, they make the same response, and the usage is
+    accounted for in the same way. Only the request itself is retried on errors.
+
+    Args:
+        messages (List[Message]): The messages to send to the chat completion
+        model (str, optional): The model to use. Defaults to None.
+        temperature (float, optional): The temperature to use. Defaults to 0.9.
+        max_tokens (int, optional): The max tokens to use. Defaults to None.
+        caller (str, optional): What the call is for, e.g. "summarize", in the call
+            records. Defaults to None.
+
+    Returns:
+        Iterator[str]: The deltas of the response from the chat completion
+    """
+    cfg = Config()
+    if model is None:
+        model = prompt.model.name
+    if temperature is None:
+        temperature = cfg.temperature
+
+    logger.debug(
+        f"{Fore.GREEN}Creating streamed chat completion with model {model}, temperature {temperature}, max_tokens {max_tokens}{Fore.RESET}"
+    )
+
+    api_manager = ApiManager()
+    messages = prompt.raw()
+
+    cached = api_manager.get_cached_response(messages, model, temperature, max_tokens)
+    if cached is not None:
+        logger.debug("Using cached chat completion")
+        return iter([cached])
+
+    deltas = api_manager.create_chat_completion_stream(
+        model=model,
+        messages=messages,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        caller=caller,
+    )
+
+    def _stream() -> Iterator[str]:
+        chunks = []
+        for delta in deltas:
+            chunks.append(delta)
+            yield delta
+        api_manager.cache_response(
+            messages, model, temperature, max_tokens, "".join(chunks)
+        )
+
+    return _stream()
+
+
+@retry_groq_api()
+async def acreate_chat_completion(
+    prompt: ChatSequence,
+    model: Optional[str] = None,
+    temperature: float = None,
+    max_tokens: Optional[int] = None,
+    caller: Optional[str] = None,
+) -> str:
+    """Create a chat completion using the async Groq client
+
+    Same as create_chat_completion, but can be awaited concurrently with other calls.
+
+    Args:
+        messages (List[Message]): The messages to send to the chat completion
+        model (str, optional): The model to use. Defaults to None.
+        temperature (float, optional): The temperature to use. Defaults to 0.9.
+        max_tokens (int, optional): The max tokens to use. Defaults to None.
+        caller (str, optional): What the call is for, e.g. "summarize", in the call
+            records. Defaults to None.
+
+    Returns:
+        str: The response from the chat completion
+    """
+    cfg = Config()
+    if model is None:
+        model = prompt.model.name
+    if temperature is None:
+        temperature = cfg.temperature
+
+    logger.debug(
+        f"{Fore.GREEN}Creating async chat completion with model {model}, temperature {temperature}, max_tokens {max_tokens}{Fore.RESET}"
+    )
+
+    api_manager = ApiManager()
+    messages = prompt.raw()
+
+    cached = api_manager.get_cached_response(messages, model, temperature, max_tokens)
+    if cached is not None:
+        logger.debug("Using cached chat completion")
+        return cached
+
+    response = await api_manager.acreate_chat_completion(
+        model=model,
+        messages=messages,
         temperature=temperature,
         max_tokens=max_tokens,
+        caller=caller,
     )
 
     resp = response.choices[0].message.content
+    api_manager.cache_response(messages, model, temperature, max_tokens, resp)
     return resp
 
 
@@ -1,14 +1,21 @@
 """Functions for counting the number of tokens in a message or string."""
 from __future__ import annotations
 
+import functools
 from typing import List
 
 from autollama.llm.base import Message
 from autollama.logs import logger
 from autollama.config import Config
 
+from .tokenizer import get_tokenizer
+
 cfg = Config()
 
+# Longer strings (e.g. whole web pages) are counted without caching them
+MAX_CACHED_STRING_LENGTH = 32768
+
+
 def count_message_tokens(
     messages: List[Message], model: str = cfg.llm_model
 ) -> int:
@@ -24,16 +31,9 @@ def count_message_tokens(
     Returns:
         int: The number of tokens used by the list of messages.
     """
-    tokens_per_message = 4  # every message follows {role/name}\n{content}\n
-    tokens_per_name = -1  # if there's a name, the role is omitted
-
     num_tokens = 0
     for message in messages:
-        num_tokens += tokens_per_message
-        for key, value in message.raw().items():
-            num_tokens += len(value.split())  # Simple token counting based on words
-            if key == "name":
-                num_tokens += tokens_per_name
+        num_tokens += _count_single_message_tokens(message, model)
     num_tokens += 3  # every reply is primed with assistant
     return num_tokens
 
@@ -49,4 +49,27 @@ def count_string_tokens(string: str, model_name: str = cfg.llm_model) -> int:
     Returns:
         int: The number of tokens in the text string.
     """
-    return len(string.split())  # Simple token counting based on words
+    if len(string) > MAX_CACHED_STRING_LENGTH:
+        return get_tokenizer(model_name).count(string)
+    return _count_string_tokens_cached(string, model_name)
+
+
+@functools.lru_cache(maxsize=4096)
+def _count_string_tokens_cached(string: str, model_name: str) -> int:
+    return get_tokenizer(model_name).count(string)
+
+
+def _count_single_message_tokens(message: Message, model: str) -> int:
+    """Counts the tokens of a message, memoized on the message itself"""
+    key = (model, message.role, message.content)
+    if message._token_count is not None and message._token_count[0] == key:
+        return message._token_count[1]
+
+    tokens_per_message = 4  # every message follows {role}\n{content}\n
+    num_tokens = (
+        tokens_per_message
+        + count_string_tokens(message.role, model)
+        + count_string_tokens(message.content, model)
+    )
+    message._token_count = (key, num_tokens)
+    return num_tokens
@@ -0,0 +1,155 @@
+"""Tokenizers used to count the tokens of the text sent to each model"""
+from __future__ import annotations
+
+import base64
+import functools
+from abc import ABC, abstractmethod
+from math import ceil
+from pathlib import Path
+
+import regex
+
+from autollama.config import Config
+from autollama.logs import logger
+
+# Pre-tokenization pattern of the Llama 3 tokenizer
+LLAMA3_PATTERN = regex.compile(
+    r"(?i:'s|'t|'re|'ve|'m|'ll|'d)|[^\r\n\p{L}\p{N}]?\p{L}+|\p{N}{1,3}"
+    r"| ?[^\s\p{L}\p{N}]+[\r\n]*|\s*[\r\n]+|\s+(?!\S)|\s+"
+)
+
+# Tokenizer of each model in GROQ_MODELS. Llama models use a BPE vocab file in the
+# tiktoken format (the `tokenizer.model` shipped with the Llama 3 weights), stored
+# as <TOKENIZERS_DIR>/<name>.tiktoken; embedding models use their spaCy tokenizer.
+MODEL_TOKENIZERS = {
+    "llama3-8b-8192": "llama3",
+    "llama-3.1-70b-versatile": "llama3",
+    "en_core_web_md": "spacy:en_core_web_md",
+}
+
+
+class Tokenizer(ABC):
+    """Splits text into the tokens a model sees"""
+
+    @abstractmethod
+    def count(self, text: str) -> int:
+        """Returns the number of tokens in the text"""
+
+
+class BPETokenizer(Tokenizer):
+    """
+    Byte-level BPE tokenizer, as used by Llama 3.
+
+    The text is pre-tokenized with a regex, then each piece is merged from bytes into
+    tokens by increasing merge rank. Most pieces are whole tokens in the vocabulary,
+    and the merges of the others are cached, so counting is mostly dict lookups.
+    """
+
+    def __init__(self, ranks: dict[bytes, int], pattern: regex.Pattern = LLAMA3_PATTERN):
+        self.ranks = ranks
+        self.pattern = pattern
+        self._encode_piece = functools.lru_cache(maxsize=65536)(self._bpe)
+
+    @classmethod
+    def from_file(cls, path: Path) -> BPETokenizer:
+        """Loads a vocab file in the tiktoken format: one `<base64 token> <rank>` per line"""
+        ranks = {}
+        with open(path, "rb") as f:
+            for line in f:
+                if line.strip():
+                    token, rank = line.split()
+                    ranks[base64.b64decode(token)] = int(rank)
+        return cls(ranks)
+
+    def encode(self, text: str) -> list[int]:
+        tokens = []
+        for piece in self.pattern.findall(text):
+            piece = piece.encode("utf-8")
+            if (rank := self.ranks.get(piece)) is not None:
+                tokens.append(rank)
+            else:
+                tokens.extend(self._encode_piece(piece))
+        return tokens
+
+    def count(self, text: str) -> int:
+        n_tokens = 0
+        for piece in self.pattern.findall(text):
+            piece = piece.encode("utf-8")
+            n_tokens += 1 if piece in self.ranks else len(self._encode_piece(piece))
+        return n_tokens
+
+    def _bpe(self, piece: bytes) -> tuple[int, ...]:
+        parts = [piece[i : i + 1] for i in range(len(piece))]
+        while len(parts) > 1:
+            ranks = [
+                self.ranks.get(parts[i] + parts[i + 1]) for i in range(len(parts) - 1)
+            ]
+            best = min(
+                (i for i, r in enumerate(ranks) if r is not None),
+                key=ranks.__getitem__,
+                default=None,
+            )
+            if best is None:
+                break
+            parts[best : best + 2] = [parts[best] + parts[best + 1]]
+        # Bytes missing from the vocabulary still take up a token each
+        return tuple(self.ranks.get(part, -1) for part in parts)
+
+
+class EstimatingTokenizer(Tokenizer):
+    """
+    Estimates the token count of a BPE tokenizer when its vocab file is missing.
+
+    The text is pre-tokenized like the real tokenizer would; each piece counts as one
+    token per `chars_per_token` characters. This slightly over-counts rather than
+    under-counts, which is the safe side when fitting text in a context window.
+    """
+
+    def __init__(self, pattern: regex.Pattern = LLAMA3_PATTERN, chars_per_token: int = 6):
+        self.pattern = pattern
+        self.chars_per_token = chars_per_token
+
+    def count(self, text: str) -> int:
+        return sum(
+            max(1, ceil(len(piece.strip()) / self.chars_per_token))
+            for piece in self.pattern.findall(text)
+        )
+
+
+class SpacyTokenizer(Tokenizer):
+    """Counts the tokens of a spaCy model, e.g. for embedding models"""
+
+    def __init__(self, model_name: str):
+        from autollama.processing.spacy_models import get_spacy_model
+
+        self.nlp = get_spacy_model(model_name)
+
+    def count(self, text: str) -> int:
+        return len(self.nlp.make_doc(text))
+
+
+@functools.lru_cache(maxsize=None)
+def get_tokenizer(model: str) -> Tokenizer:
+    """
+    Get the tokenizer of a model, loading it on first use.
+
+    Args:
+        model (str): The name of the model, a key of GROQ_MODELS.
+
+    Returns:
+        Tokenizer: The tokenizer of the model.
+    """
+    name = MODEL_TOKENIZERS.get(model, "llama3")
+    if name.startswith("spacy:"):
+        return SpacyTokenizer(name.removeprefix("spacy:"))
+
+    path = Path(Config().tokenizers_dir) / f"{name}.tiktoken"
+    if not path.exists():
+        logger.debug(
+            f"Tokenizer vocab file {path} not found; estimating token counts for "
+            f"model '{model}'"
+        )
+        return EstimatingTokenizer()
+
+    logger.debug(f"Loading tokenizer for model '{model}' from {path}")
+    return BPETokenizer.from_file(path)
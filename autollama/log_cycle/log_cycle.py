@@ -1,7 +1,9 @@
-import json
 import os
+import threading
 from typing import Any, Dict, Union
 
+from autollama.log_cycle.profiler import profiler
+from autollama.log_cycle.writer import CycleLogWriter
 from autollama.logs import logger
 
 DEFAULT_PREFIX = "agent"
@@ -13,49 +15,48 @@ SUMMARY_FILE_NAME = "summary.txt"
 SUPERVISOR_FEEDBACK_FILE_NAME = "supervisor_feedback.txt"
 PROMPT_SUPERVISOR_FEEDBACK_FILE_NAME = "prompt_supervisor_feedback.json"
 USER_INPUT_FILE_NAME = "user_input.txt"
+CYCLE_PROFILE_FILE_NAME = "cycle_profile.json"
 
 
 class LogCycleHandler:
     """
     A class for logging cycle data.
+
+    The files are written in the background by the CycleLogWriter, which creates
+    the directory of each cycle when it writes its first file. The files of a cycle
+    are numbered in the order they are logged, which is safe from several threads,
+    e.g. the background update of the running summary.
     """
 
     def __init__(self):
-        self.log_count_within_cycle = 0
-
-    @staticmethod
-    def create_directory_if_not_exists(directory_path: str) -> None:
-        if not os.path.exists(directory_path):
-            os.makedirs(directory_path, exist_ok=True)
+        self.writer = CycleLogWriter()
+        self._outer_folders: dict[tuple[str, str], str] = {}
+        # Number of files logged in each cycle folder
+        self._log_counts: dict[str, int] = {}
+        self._lock = threading.Lock()
 
-    def create_outer_directory(self, ai_name: str, created_at: str) -> str:
-        log_directory = logger.get_log_directory()
+    def get_outer_directory(self, ai_name: str, created_at: str) -> str:
+        if (outer_folder_path := self._outer_folders.get((ai_name, created_at))) is None:
+            log_directory = logger.get_log_directory()
 
-        if os.environ.get("OVERWRITE_DEBUG") == "1":
-            outer_folder_name = "auto_gpt"
-        else:
-            ai_name_short = ai_name[:15] if ai_name else DEFAULT_PREFIX
-            outer_folder_name = f"{created_at}_{ai_name_short}"
+            if os.environ.get("OVERWRITE_DEBUG") == "1":
+                outer_folder_name = "auto_gpt"
+            else:
+                ai_name_short = ai_name[:15] if ai_name else DEFAULT_PREFIX
+                outer_folder_name = f"{created_at}_{ai_name_short}"
 
-        outer_folder_path = os.path.join(log_directory, "DEBUG", outer_folder_name)
-        self.create_directory_if_not_exists(outer_folder_path)
+            outer_folder_path = os.path.join(log_directory, "DEBUG", outer_folder_name)
+            self._outer_folders[(ai_name, created_at)] = outer_folder_path
 
         return outer_folder_path
 
-    def create_inner_directory(self, outer_folder_path: str, cycle_count: int) -> str:
-        nested_folder_name = str(cycle_count).zfill(3)
-        nested_folder_path = os.path.join(outer_folder_path, nested_folder_name)
-        self.create_directory_if_not_exists(nested_folder_path)
-
-        return nested_folder_path
-
-    def create_nested_directory(
+    def get_nested_directory(
         self, ai_name: str, created_at: str, cycle_count: int
     ) -> str:
-        outer_folder_path = self.create_outer_directory(ai_name, created_at)
-        nested_folder_path = self.create_inner_directory(outer_folder_path, cycle_count)
+        outer_folder_path = self.get_outer_directory(ai_name, created_at)
+        nested_folder_name = str(cycle_count).zfill(3)
 
-        return nested_folder_path
+        return os.path.join(outer_folder_path, nested_folder_name)
 
     def log_cycle(
         self,
@@ -72,14 +73,13 @@ class LogCycleHandler:
             data (Any): The data to be logged.
             file_name (str): The name of the file to save the logged data.
         """
-        nested_folder_path = self.create_nested_directory(
-            ai_name, created_at, cycle_count
-        )
-
-        json_data = json.dumps(data, ensure_ascii=False, indent=4)
-        log_file_path = os.path.join(
-            nested_folder_path, f"{self.log_count_within_cycle}_{file_name}"
-        )
-
-        logger.log_json(json_data, log_file_path)
-        self.log_count_within_cycle += 1
+        with profiler.span("logging"):
+            nested_folder_path = self.get_nested_directory(
+                ai_name, created_at, cycle_count
+            )
+            with self._lock:
+                log_count = self._log_counts.get(nested_folder_path, 0)
+                self._log_counts[nested_folder_path] = log_count + 1
+            log_file_path = os.path.join(nested_folder_path, f"{log_count}_{file_name}")
+
+            self.writer.write(log_file_path, data)
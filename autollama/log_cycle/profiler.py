@@ -0,0 +1,169 @@
+"""Timing of the phases of the agent's cycles"""
+from __future__ import annotations
+
+import atexit
+import threading
+import time
+from math import ceil
+from typing import Optional
+
+from autollama.logs import logger
+
+
+class _Span:
+    """Times one run of a phase, as a context manager or with start() and stop()"""
+
+    __slots__ = ("profiler", "phase", "started", "nested")
+
+    def __init__(self, profiler: CycleProfiler, phase: str) -> None:
+        self.profiler = profiler
+        self.phase = phase
+        self.started = 0.0
+        # Time spent in the spans opened within this one, in the same thread
+        self.nested = 0.0
+
+    def start(self) -> _Span:
+        self.profiler._open_spans().append(self)
+        self.started = time.perf_counter()
+        return self
+
+    def stop(self) -> None:
+        duration = time.perf_counter() - self.started
+        open_spans = self.profiler._open_spans()
+        open_spans.remove(self)
+        if open_spans:
+            open_spans[-1].nested += duration
+        self.profiler.add(self.phase, duration - self.nested)
+
+    def __enter__(self) -> _Span:
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+class _NullSpan:
+    """Span returned while profiling is disabled, which does nothing"""
+
+    __slots__ = ()
+
+    def start(self) -> _NullSpan:
+        return self
+
+    def stop(self) -> None:
+        pass
+
+    def __enter__(self) -> _NullSpan:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class CycleProfiler:
+    """
+    Times the phases of each agent cycle, e.g. building the context or waiting for
+    the LLM.
+
+    A phase is timed with a span, either `with profiler.span("llm"): ...` or
+    `span = profiler.span("context").start()` ... `span.stop()`. The spans of a
+    phase within a cycle add up, whichever thread they run in. A span opened within
+    another one in the same thread is only counted in its own phase, so the phases
+    of a cycle add up to at most its total. While profiling is disabled, `span`
+    returns a shared span that does nothing, so the hooks cost next to nothing.
+    """
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.cycles: list[dict[str, float]] = []
+        self._current: dict[str, float] = {}
+        self._cycle_started: Optional[float] = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def enable(self) -> None:
+        """Starts profiling, and prints a report of the cycles at exit"""
+        if not self.enabled:
+            self.enabled = True
+            atexit.register(self._log_report)
+
+    def span(self, phase: str) -> _Span | _NullSpan:
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, phase)
+
+    def add(self, phase: str, duration: float) -> None:
+        with self._lock:
+            self._current[phase] = self._current.get(phase, 0.0) + duration
+
+    def _open_spans(self) -> list[_Span]:
+        """The spans open in the current thread, innermost last"""
+        if (open_spans := getattr(self._local, "spans", None)) is None:
+            open_spans = self._local.spans = []
+        return open_spans
+
+    def start_cycle(self) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._current = {}
+            self._cycle_started = time.perf_counter()
+
+    def end_cycle(self) -> Optional[dict[str, float]]:
+        """Ends the current cycle, returns the time spent in each phase"""
+        if not self.enabled or self._cycle_started is None:
+            return None
+        with self._lock:
+            timings = dict(self._current)
+            timings["total"] = time.perf_counter() - self._cycle_started
+            self._cycle_started = None
+        self.cycles.append(timings)
+        return timings
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """
+        Aggregates the timings of the phases over all the cycles.
+
+        Returns:
+            dict: For each phase, the number of cycles it ran in and the p50 and p95
+                of its time per cycle, in seconds.
+        """
+        phases: dict[str, list[float]] = {}
+        for timings in self.cycles:
+            for phase, duration in timings.items():
+                phases.setdefault(phase, []).append(duration)
+        return {
+            phase: {
+                "cycles": len(durations),
+                "p50": _percentile(durations, 50),
+                "p95": _percentile(durations, 95),
+            }
+            for phase, durations in phases.items()
+        }
+
+    def report(self) -> str:
+        lines = [f"{'PHASE':<16}{'CYCLES':>8}{'P50 (ms)':>12}{'P95 (ms)':>12}"]
+        for phase, stats in sorted(
+            self.summary().items(), key=lambda item: -item[1]["p50"]
+        ):
+            lines.append(
+                f"{phase:<16}{stats['cycles']:>8}"
+                f"{stats['p50'] * 1000:>12.1f}{stats['p95'] * 1000:>12.1f}"
+            )
+        return "\n".join(lines)
+
+    def _log_report(self) -> None:
+        if self.cycles:
+            logger.info(f"Time per cycle spent in each phase:\n{self.report()}")
+
+
+def _percentile(values: list[float], percent: float) -> float:
+    """Nearest-rank percentile"""
+    values = sorted(values)
+    return values[max(0, ceil(len(values) * percent / 100) - 1)]
+
+
+profiler = CycleProfiler()
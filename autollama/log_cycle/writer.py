@@ -0,0 +1,103 @@
+"""Background writer for the cycle logs"""
+from __future__ import annotations
+
+import atexit
+import os
+import queue
+import threading
+from typing import Any, Optional
+
+import orjson
+
+from autollama.logs import logger
+from autollama.singleton import Singleton
+
+# Maximum number of files written between two fsyncs
+MAX_BATCH_SIZE = 64
+
+
+class CycleLogWriter(metaclass=Singleton):
+    """
+    Writes the cycle logs from a background thread, so that the agent doesn't wait
+    on the disk.
+
+    `write` serializes the data right away, with orjson, so that it can't change
+    before it is written, and queues it. The writer thread writes the queued files
+    in batches, fsyncing each batch once all of its files are written, and creates
+    each directory once.
+    """
+
+    def __init__(self) -> None:
+        self._queue: queue.Queue[Optional[tuple[str, bytes]]] = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._created_dirs: set[str] = set()
+
+    def write(self, path: str, data: Any) -> None:
+        """Queues the data to be written as JSON to the file at path"""
+        content = orjson.dumps(data, default=str, option=orjson.OPT_INDENT_2)
+        self._ensure_started()
+        self._queue.put((path, content))
+
+    def flush(self) -> None:
+        """Blocks until all the queued files are written"""
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self) -> None:
+        """Writes the queued files and stops the writer thread"""
+        with self._lock:
+            if self._thread is None:
+                return
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def _ensure_started(self) -> None:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._run, name="cycle-log-writer", daemon=True
+                    )
+                    self._thread.start()
+                    atexit.register(self.close)
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < MAX_BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = None in batch
+            self._write_batch([item for item in batch if item is not None])
+            for _ in batch:
+                self._queue.task_done()
+            if stop:
+                return
+
+    def _write_batch(self, batch: list[tuple[str, bytes]]) -> None:
+        files = []
+        for path, content in batch:
+            try:
+                directory = os.path.dirname(path)
+                if directory not in self._created_dirs:
+                    os.makedirs(directory, exist_ok=True)
+                    self._created_dirs.add(directory)
+                f = open(path, "wb")
+                files.append(f)
+                f.write(content)
+            except OSError as e:
+                logger.error(f"Could not write cycle log {path}: {e}")
+
+        for f in files:
+            try:
+                f.flush()
+                os.fsync(f.fileno())
+            except OSError as e:
+                logger.error(f"Could not write cycle log {f.name}: {e}")
+            finally:
+                f.close()
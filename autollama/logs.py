@@ -1,11 +1,15 @@
 """Logging module for Auto-Llama."""
+import atexit
 import logging
 import os
+import queue
 import random
 import re
+import threading
 import time
 from logging import LogRecord
-from typing import Any
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Callable, Optional, Union
 
 from colorama import Fore, Style
 
@@ -19,6 +23,18 @@ class Logger(metaclass=Singleton):
     Logger that handle titles in different colors.
     Outputs logs in console, activity.log, and errors.log
     For console handler: simulates typing
+
+    The loggers only put the records in a queue; a listener thread writes them to
+    the console and the log files, so the caller never waits on console or disk
+    I/O, nor on the typing simulation. Call `flush` before reading user input so
+    that everything logged so far is shown first.
+
+    Messages are only formatted if they are logged: pass `%`-style args rather than
+    an f-string, or a callable that returns the message, e.g.
+    `logger.debug("Adding message: %s", message)` or
+    `logger.debug(lambda: f"Memory: {memory.dump()}")`.
+    Each subsystem (e.g. "memory", "llm") logs through a child logger whose level
+    can be set on its own with `set_subsystem_levels`.
     """
 
     def __init__(self):
@@ -64,25 +80,41 @@ class Logger(metaclass=Singleton):
         )
         error_handler.setFormatter(error_formatter)
 
+        # All records go through one queue, so they are output in order; each
+        # console handler only outputs the records of its own logger
+        self.typing_console_handler.addFilter(lambda record: record.name == "TYPER")
+        self.console_handler.addFilter(
+            lambda record: record.name.split(".")[0] == "LOGGER"
+        )
+        self._queue = queue.SimpleQueue()
+        self.queue_listener = _QueueListener(
+            self._queue,
+            self.typing_console_handler,
+            self.console_handler,
+            self.file_handler,
+            error_handler,
+            respect_handler_level=True,
+        )
+        queue_handler = QueueHandler(self._queue)
+
         self.typing_logger = logging.getLogger("TYPER")
-        self.typing_logger.addHandler(self.typing_console_handler)
-        self.typing_logger.addHandler(self.file_handler)
-        self.typing_logger.addHandler(error_handler)
+        self.typing_logger.addHandler(queue_handler)
         self.typing_logger.setLevel(logging.DEBUG)
 
         self.logger = logging.getLogger("LOGGER")
-        self.logger.addHandler(self.console_handler)
-        self.logger.addHandler(self.file_handler)
-        self.logger.addHandler(error_handler)
+        self.logger.addHandler(queue_handler)
         self.logger.setLevel(logging.DEBUG)
 
         self.json_logger = logging.getLogger("JSON_LOGGER")
-        self.json_logger.addHandler(self.file_handler)
-        self.json_logger.addHandler(error_handler)
+        self.json_logger.addHandler(queue_handler)
         self.json_logger.setLevel(logging.DEBUG)
 
+        self.queue_listener.start()
+        atexit.register(self.queue_listener.stop)
+
         self.speak_mode = False
         self.chat_plugins = []
+        self._subsystem_loggers: dict[str, logging.Logger] = {}
 
     def typewriter_log(
         self, title="", title_color="", content="", speak_text=False, level=logging.INFO
@@ -105,49 +137,102 @@ class Logger(metaclass=Singleton):
 
     def debug(
         self,
-        message,
+        message: Union[str, Callable[[], str]],
+        *args,
         title="",
         title_color="",
+        subsystem: Optional[str] = None,
     ):
-        self._log(title, title_color, message, logging.DEBUG)
+        self._log(title, title_color, message, logging.DEBUG, args, subsystem)
 
     def info(
         self,
-        message,
+        message: Union[str, Callable[[], str]],
+        *args,
         title="",
         title_color="",
+        subsystem: Optional[str] = None,
     ):
-        self._log(title, title_color, message, logging.INFO)
+        self._log(title, title_color, message, logging.INFO, args, subsystem)
 
     def warn(
         self,
-        message,
+        message: Union[str, Callable[[], str]],
+        *args,
         title="",
         title_color="",
+        subsystem: Optional[str] = None,
     ):
-        self._log(title, title_color, message, logging.WARN)
+        self._log(title, title_color, message, logging.WARN, args, subsystem)
 
     def error(self, title, message=""):
         self._log(title, Fore.RED, message, logging.ERROR)
 
+    def is_enabled_for(self, level: int, subsystem: Optional[str] = None) -> bool:
+        """Whether messages of this level are logged, to guard costly log calls"""
+        return self._get_logger(subsystem).isEnabledFor(level)
+
     def _log(
         self,
         title: str = "",
         title_color: str = "",
-        message: str = "",
+        message: Union[str, Callable[[], str]] = "",
         level=logging.INFO,
+        args: tuple = (),
+        subsystem: Optional[str] = None,
     ):
+        logger = self._get_logger(subsystem)
+        if not logger.isEnabledFor(level):
+            return
+        if callable(message):
+            message = message()
         if message:
             if isinstance(message, list):
                 message = " ".join(message)
-        self.logger.log(
-            level, message, extra={"title": str(title), "color": str(title_color)}
+        logger.log(
+            level,
+            message,
+            *args,
+            extra={"title": str(title), "color": str(title_color)},
         )
 
+    def _get_logger(self, subsystem: Optional[str]) -> logging.Logger:
+        if subsystem is None:
+            return self.logger
+        if (logger := self._subsystem_loggers.get(subsystem)) is None:
+            # Child loggers use the handlers of the main logger, and its level
+            # unless they have their own
+            logger = self.logger.getChild(subsystem)
+            self._subsystem_loggers[subsystem] = logger
+        return logger
+
     def set_level(self, level):
         self.logger.setLevel(level)
         self.typing_logger.setLevel(level)
 
+    def set_typing_simulation(self, enabled: bool) -> None:
+        """Enables or disables the simulated typing of typewriter_log messages"""
+        self.typing_console_handler.simulate_typing = enabled
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """Blocks until all the records logged so far have been output"""
+        if self.queue_listener._thread is None:
+            return
+        flushed = threading.Event()
+        self._queue.put(logging.makeLogRecord({"flushed": flushed}))
+        flushed.wait(timeout)
+
+    def set_subsystem_levels(self, levels: dict[str, Union[int, str]]) -> None:
+        """Sets the log level of subsystems, e.g. {"memory": "WARNING"}"""
+        for subsystem, level in levels.items():
+            if isinstance(level, str):
+                level = level.upper()
+            self._get_logger(subsystem).setLevel(level)
+
+    def set_file_level(self, level: Union[int, str]) -> None:
+        """Sets the minimum level of the messages written to activity.log"""
+        self.file_handler.setLevel(level.upper() if isinstance(level, str) else level)
+
     def double_check(self, additionalText=None):
         if not additionalText:
             additionalText = (
@@ -183,11 +268,20 @@ Output stream to console using simulated typing
 
 
 class TypingConsoleHandler(logging.StreamHandler):
+    simulate_typing = True
+
     def emit(self, record):
         min_typing_speed = 0.05
         max_typing_speed = 0.01
 
         msg = self.format(record)
+        if not self.simulate_typing:
+            try:
+                print(msg)
+            except Exception:
+                self.handleError(record)
+            return
+
         try:
             words = msg.split()
             for i, word in enumerate(words):
@@ -204,6 +298,16 @@ class TypingConsoleHandler(logging.StreamHandler):
             self.handleError(record)
 
 
+class _QueueListener(QueueListener):
+    """Outputs the queued records, and signals when a flush marker is reached"""
+
+    def handle(self, record: LogRecord) -> None:
+        if (flushed := getattr(record, "flushed", None)) is not None:
+            flushed.set()
+            return
+        super().handle(record)
+
+
 class ConsoleHandler(logging.StreamHandler):
     def emit(self, record) -> None:
         msg = self.format(record)
@@ -7,6 +7,7 @@ from colorama import Fore, Style
 
 from autollama.agent import Agent
 from autollama.commands.command import CommandRegistry
+from autollama.commands.manifest import COMMAND_MANIFEST
 from autollama.config import Config, check_groq_api_key
 from autollama.configurator import create_config
 from autollama.logs import logger
@@ -51,6 +52,9 @@ def run_auto_llama(
     logger.speak_mode = speak
 
     cfg = Config()
+    logger.set_subsystem_levels(cfg.log_levels)
+    logger.set_file_level(cfg.log_file_level)
+    logger.set_typing_simulation(cfg.typing_simulation)
     # TODO: fill in llm values here
     check_groq_api_key()
 
@@ -114,8 +118,14 @@ def run_auto_llama(
         f"The following command categories are enabled: {enabled_command_categories}"
     )
 
+    # The built-in command modules are only imported once their command is executed
     for command_category in enabled_command_categories:
-        command_registry.import_commands(command_category)
+        if command_category in COMMAND_MANIFEST:
+            command_registry.register_manifest(
+                command_category, COMMAND_MANIFEST[command_category]
+            )
+        else:
+            command_registry.import_commands(command_category)
 
     ai_name = ""
     ai_config = construct_main_ai_config()
@@ -126,9 +136,8 @@ def run_auto_llama(
     # Initialize variables
     next_action_count = 0
 
-    # Initialize memory and make sure it is empty.
-    # this is particularly important for indexing and referencing pinecone memory
-    memory = get_memory(cfg, init=True)
+    # Initialize memory; memories stored by previous runs are reloaded from disk
+    memory = get_memory(cfg)
     logger.typewriter_log(
         "Using memory of type:", Fore.GREEN, f"{memory.__class__.__name__}"
     )
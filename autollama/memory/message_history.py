@@ -2,6 +2,8 @@ from __future__ import annotations
 
 import copy
 import json
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass, field
 from typing import TYPE_CHECKING
 
@@ -9,16 +11,35 @@ if TYPE_CHECKING:
     from autogpt.agent import Agent
 
 from autollama.config import Config
-from autollama.json_utils.utilities import (
-    LLM_DEFAULT_RESPONSE_FORMAT,
-    is_string_valid_json,
-)
+from autollama.json_utils.utilities import get_response_format, is_string_valid_json
 from autollama.llm.base import ChatSequence, Message, MessageRole, MessageType
-from autollama.llm.utils import create_chat_completion
+from autollama.llm.utils import count_message_tokens, create_chat_completion
 from autollama.log_cycle.log_cycle import PROMPT_SUMMARY_FILE_NAME, SUMMARY_FILE_NAME
 from autollama.logs import logger
 
 
+@dataclass
+class MessageCycle:
+    """The messages of one valid cycle: user input, AI response and action result"""
+
+    user_message: Message | None
+    ai_message: Message
+    result_message: Message
+    token_lengths: dict[str, int] = field(default_factory=dict, repr=False)
+
+    def __iter__(self):
+        return iter((self.user_message, self.ai_message, self.result_message))
+
+    @property
+    def messages(self) -> list[Message]:
+        return [msg for msg in self if msg is not None]
+
+    def token_length(self, model: str) -> int:
+        if model not in self.token_lengths:
+            self.token_lengths[model] = count_message_tokens(self.messages, model)
+        return self.token_lengths[model]
+
+
 @dataclass
 class MessageHistory:
     agent: Agent
@@ -26,16 +47,35 @@ class MessageHistory:
     summary: str = "I was created"
     last_trimmed_index: int = 0
 
+    # Index of the valid cycles in `messages`, which is only ever appended to.
+    # Messages up to _n_indexed_messages have been parsed and validated once already.
+    _cycles: list[MessageCycle] = field(default_factory=list, init=False, repr=False)
+    _n_indexed_messages: int = field(default=0, init=False, repr=False)
+
+    # The running summary is updated in the background: trimmed messages wait in
+    # _unsummarized until a job takes them, and are in _summarizing while it runs.
+    # The job logs its prompt and summary in the cycle the messages were trimmed in.
+    _unsummarized: list[Message] = field(default_factory=list, init=False, repr=False)
+    _unsummarized_cycle: int = field(default=0, init=False, repr=False)
+    _summarizing: list[Message] = field(default_factory=list, init=False, repr=False)
+    _summary_job: Future | None = field(default=None, init=False, repr=False)
+    _summary_executor: ThreadPoolExecutor | None = field(
+        default=None, init=False, repr=False
+    )
+    _summary_lock: threading.Lock = field(
+        default_factory=threading.Lock, init=False, repr=False
+    )
+
     def __getitem__(self, i: int):
-        logger.debug(f"Accessing message at index {i}")
+        logger.debug("Accessing message at index %s", i, subsystem="memory")
         return self.messages[i]
 
     def __iter__(self):
-        logger.debug("Iterating over all messages")
+        logger.debug("Iterating over all messages", subsystem="memory")
         return iter(self.messages)
 
     def __len__(self):
-        logger.debug(f"Getting the length of messages: {len(self.messages)}")
+        logger.debug("Getting the length of messages: %d", len(self.messages), subsystem="memory")
         return len(self.messages)
 
     def add(
@@ -44,45 +84,136 @@ class MessageHistory:
         content: str,
         type: MessageType | None = None,
     ):
-        logger.debug(f"Adding a new message with role {role} and content: {content}")
+        logger.debug(
+            "Adding a new message with role %s and content: %s", role, content, subsystem="memory"
+        )
         return self.append(Message(role, content, type))
 
     def append(self, message: Message):
-        logger.debug(f"Appending message: {message}")
+        logger.debug("Appending message: %s", message, subsystem="memory")
         self.messages.append(message)
 
     def trim_messages(
         self,
         current_message_chain: list[Message],
     ) -> tuple[Message, list[Message]]:
-        logger.debug("Trimming messages not in the current message chain")
-        new_messages = [
-            msg for i, msg in enumerate(self) if i > self.last_trimmed_index
-        ]
-        new_messages_not_in_chain = [
-            msg for msg in new_messages if msg not in current_message_chain
-        ]
+        logger.debug("Trimming messages not in the current message chain", subsystem="memory")
+        in_chain = {id(msg) for msg in current_message_chain}
+        new_messages_not_in_chain = []
+        for i in range(self.last_trimmed_index + 1, len(self.messages)):
+            if id(self.messages[i]) not in in_chain:
+                new_messages_not_in_chain.append(self.messages[i])
+                last_trimmed_index = i
 
         if not new_messages_not_in_chain:
-            logger.debug("No new messages to trim")
+            logger.debug("No new messages to trim", subsystem="memory")
             return self.summary_message(), []
 
-        new_summary_message = self.update_running_summary(
-            new_events=new_messages_not_in_chain
-        )
-
-        last_message = new_messages_not_in_chain[-1]
-        self.last_trimmed_index = self.messages.index(last_message)
+        self.last_trimmed_index = last_trimmed_index
         logger.debug(
-            f"Updated last_trimmed_index to {self.last_trimmed_index} after trimming"
+            "Updated last_trimmed_index to %d after trimming",
+            self.last_trimmed_index,
+            subsystem="memory",
         )
 
-        return new_summary_message, new_messages_not_in_chain
+        # Summarize the trimmed messages in the background, and build this context
+        # with the latest finished summary, unless it is too far behind
+        with self._summary_lock:
+            self._unsummarized.extend(new_messages_not_in_chain)
+            self._unsummarized_cycle = self.agent.cycle_count
+        self._start_summary_update()
+        self._limit_summary_staleness()
+
+        return self.summary_message(), new_messages_not_in_chain
+
+    def _start_summary_update(self) -> None:
+        """Starts a background update of the summary with the unsummarized messages"""
+        with self._summary_lock:
+            if self._summary_job is not None or not self._unsummarized:
+                return
+            events, self._unsummarized = self._unsummarized, []
+            self._summarizing = events
+            if self._summary_executor is None:
+                self._summary_executor = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix="running-summary"
+                )
+            self._summary_job = self._summary_executor.submit(
+                self._update_summary_job, events, self._unsummarized_cycle
+            )
+
+    def _update_summary_job(self, events: list[Message], cycle_count: int) -> None:
+        try:
+            self.update_running_summary(new_events=events, cycle_count=cycle_count)
+        except Exception as e:
+            logger.warn(
+                f"Failed to update the running summary: {e}. "
+                f"Adding the {len(events)} trimmed messages to it as they are."
+            )
+            self.summary = self._fallback_summary(events)
+        finally:
+            with self._summary_lock:
+                self._summary_job = None
+                self._summarizing = []
+        # Messages may have been trimmed while this job was running
+        self._start_summary_update()
+
+    def _limit_summary_staleness(self) -> None:
+        """Waits for the background updates until the summary is missing at most
+        SUMMARY_MAX_STALE_MESSAGES trimmed messages"""
+        max_stale_messages = Config().summary_max_stale_messages
+        while True:
+            with self._summary_lock:
+                n_stale = len(self._unsummarized) + len(self._summarizing)
+                job = self._summary_job
+            if n_stale <= max_stale_messages:
+                return
+            if job is None:
+                self._start_summary_update()
+                continue
+            logger.debug(
+                "Running summary is %d messages behind; waiting", n_stale, subsystem="memory"
+            )
+            job.result()
+
+    def _fallback_summary(self, events: list[Message]) -> str:
+        """Appends the trimmed messages to the summary without calling the LLM"""
+        max_length = 300
+        lines = [self.summary]
+        for event in self._summary_events(events):
+            content = " ".join(event.content.split())
+            if len(content) > max_length:
+                content = content[: max_length - 3] + "..."
+            lines.append(f"- {event.role}: {content}")
+        return "\n".join(lines)
 
     def per_cycle(self, messages: list[Message] | None = None):
-        logger.debug("Iterating over message cycles")
-        messages = messages or self.messages
-        for i in range(0, len(messages) - 1):
+        logger.debug("Iterating over message cycles", subsystem="memory")
+        if messages:
+            yield from self._scan_cycles(messages, 0)
+        else:
+            yield from self.cycles()
+
+    def cycles(self) -> list[MessageCycle]:
+        """
+        Get the valid cycles of the message history, oldest first.
+
+        Only the messages added since the last call are parsed and validated; the
+        cycles found before, with their cached token lengths, are reused.
+        """
+        if len(self.messages) < self._n_indexed_messages:
+            # The history was cleared or replaced; rebuild the index
+            self._cycles = []
+            self._n_indexed_messages = 0
+
+        # The last message may be an AI response that has no result yet
+        start = max(self._n_indexed_messages - 1, 0)
+        self._cycles.extend(self._scan_cycles(self.messages, start))
+        self._n_indexed_messages = max(self._n_indexed_messages, len(self.messages))
+        return self._cycles
+
+    def _scan_cycles(self, messages: list[Message], start: int):
+        response_format = get_response_format()
+        for i in range(start, len(messages) - 1):
             ai_message = messages[i]
             if ai_message.type != "ai_response":
                 continue
@@ -92,34 +223,27 @@ class MessageHistory:
             result_message = messages[i + 1]
             try:
                 assert is_string_valid_json(
-                    ai_message.content, LLM_DEFAULT_RESPONSE_FORMAT
+                    ai_message.content, response_format
                 ), "AI response is not a valid JSON object"
                 assert result_message.type == "action_result"
-                logger.debug(f"Yielding valid cycle messages: {ai_message}, {result_message}")
-                yield user_message, ai_message, result_message
+                logger.debug(
+                    "Yielding valid cycle messages: %s, %s",
+                    ai_message,
+                    result_message,
+                    subsystem="memory",
+                )
+                yield MessageCycle(user_message, ai_message, result_message)
             except AssertionError as err:
                 logger.debug(
-                    f"Invalid item in message history: {err}; Messages: {messages[i-1:i+2]}"
+                    lambda: f"Invalid item in message history: {err}; "
+                    f"Messages: {messages[i-1:i+2]}",
+                    subsystem="memory",
                 )
 
-    def summary_message(self) -> Message:
-        logger.debug(f"Returning summary message: {self.summary}")
-        return Message(
-            "system",
-            f"This reminds you of these events from your past: \n{self.summary}",
-        )
-
-    def update_running_summary(self, new_events: list[Message]) -> Message:
-        logger.debug("Updating running summary with new events")
-        cfg = Config()
-
-        if not new_events:
-            logger.debug("No new events to summarize.")
-            return self.summary_message()
-
-        new_events = copy.deepcopy(new_events)
-
-        for event in new_events:
+    def _summary_events(self, events: list[Message]) -> list[Message]:
+        """Copies the events to summarize, from the point of view of the agent"""
+        summary_events = []
+        for event in copy.deepcopy(events):
             if event.role.lower() == "assistant":
                 event.role = "you"
                 try:
@@ -134,7 +258,41 @@ class MessageHistory:
                 event.role = "your computer"
 
             elif event.role == "user":
-                new_events.remove(event)
+                continue
+            summary_events.append(event)
+        return summary_events
+
+    def summary_message(self) -> Message:
+        logger.debug("Returning summary message: %s", self.summary, subsystem="memory")
+        return Message(
+            "system",
+            f"This reminds you of these events from your past: \n{self.summary}",
+        )
+
+    def update_running_summary(
+        self, new_events: list[Message], cycle_count: int | None = None
+    ) -> Message:
+        """
+        Adds the new events to the running summary.
+
+        Args:
+            new_events (list[Message]): The messages to add to the summary.
+            cycle_count (int, optional): The cycle to log the summary in, by default
+                the agent's current cycle.
+
+        Returns:
+            Message: The updated summary message.
+        """
+        if cycle_count is None:
+            cycle_count = self.agent.cycle_count
+        logger.debug("Updating running summary with new events", subsystem="memory")
+        cfg = Config()
+
+        if not new_events:
+            logger.debug("No new events to summarize.", subsystem="memory")
+            return self.summary_message()
+
+        new_events = self._summary_events(new_events)
 
         prompt = f'''Your task is to create a concise running summary of actions and information results in the provided text, focusing on key and potentially important information to remember.
 
@@ -155,18 +313,18 @@ Latest Development:
         self.agent.log_cycle_handler.log_cycle(
             self.agent.config.ai_name,
             self.agent.created_at,
-            self.agent.cycle_count,
+            cycle_count,
             prompt.raw(),
             PROMPT_SUMMARY_FILE_NAME,
         )
 
-        self.summary = create_chat_completion(prompt)
-        logger.debug(f"Updated summary: {self.summary}")
+        self.summary = create_chat_completion(prompt, caller="running_summary")
+        logger.debug("Updated summary: %s", self.summary, subsystem="memory")
 
         self.agent.log_cycle_handler.log_cycle(
             self.agent.config.ai_name,
             self.agent.created_at,
-            self.agent.cycle_count,
+            cycle_count,
             self.summary,
             SUMMARY_FILE_NAME,
         )
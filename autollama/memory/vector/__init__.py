@@ -3,12 +3,13 @@ from autollama.logs import logger
 
 from .memory_item import MemoryItem, MemoryItemRelevance
 from .providers.base import VectorMemoryProvider as VectorMemory
+from .providers.ivf import IVFMemory
 from .providers.json_file import JSONFileMemory
 from .providers.no_memory import NoMemory
 
 # List of supported memory backends
 # Add a backend to this list if the import attempt is successful
-supported_memory = ["json_file", "no_memory"]
+supported_memory = ["json_file", "ivf", "no_memory"]
 
 # try:
 #     from .providers.redis import RedisMemory
@@ -45,6 +46,13 @@ def get_memory(cfg: Config, init=False) -> VectorMemory:
     match cfg.memory_backend:
         case "json_file":
             memory = JSONFileMemory(cfg)
+            if init:
+                memory.clear()
+
+        case "ivf":
+            memory = IVFMemory(cfg)
+            if init:
+                memory.clear()
 
         case "pinecone":
             raise NotImplementedError(
@@ -123,6 +131,7 @@ __all__ = [
     "MemoryItem",
     "MemoryItemRelevance",
     "JSONFileMemory",
+    "IVFMemory",
     "NoMemory",
     "VectorMemory",
     # "RedisMemory",
@@ -0,0 +1,140 @@
+"""Content-addressed cache for text embeddings"""
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from autollama.config import Config
+from autollama.logs import logger
+from autollama.singleton import Singleton
+
+
+class EmbeddingCache(metaclass=Singleton):
+    """
+    Two-tier cache of embeddings, keyed by a hash of the embedding model name and
+    the text that was embedded.
+
+    The first tier is a bounded in-memory LRU (EMBEDDING_CACHE_SIZE entries); the
+    optional second tier is an sqlite database at EMBEDDING_CACHE_PATH that persists
+    across runs. Because the model name is part of the key, changing
+    EMBEDDING_MODEL invalidates all previously cached embeddings.
+    """
+
+    def __init__(self) -> None:
+        cfg = Config()
+        self.max_size = cfg.embedding_cache_size
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._entries: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._model: Optional[str] = None
+
+        if cfg.embedding_cache_path:
+            self._open_db(Path(cfg.embedding_cache_path))
+
+    @staticmethod
+    def key(model: str, text: str) -> str:
+        return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+    def get(self, model: str, text: str) -> Optional[np.ndarray]:
+        """Returns the cached embedding of `text` by `model`, or None"""
+        key = self.key(model, text)
+        with self._lock:
+            self._check_model(model)
+
+            if (vector := self._entries.get(key)) is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return vector
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT vector FROM embeddings WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    vector = np.frombuffer(row[0], dtype=np.float32)
+                    self._put(key, vector)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return vector
+
+            self.misses += 1
+            return None
+
+    def set(self, model: str, text: str, vector) -> None:
+        """Stores the embedding of `text` by `model` in the cache"""
+        self.set_many(model, [text], [vector])
+
+    def set_many(self, model: str, texts: list[str], vectors) -> None:
+        """Stores the embeddings of several texts by `model`, in one transaction"""
+        entries = [
+            (self.key(model, text), np.asarray(vector, dtype=np.float32))
+            for text, vector in zip(texts, vectors)
+        ]
+        with self._lock:
+            self._check_model(model)
+            for key, vector in entries:
+                self._put(key, vector)
+            if self._db is not None:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, model, vector) "
+                    "VALUES (?, ?, ?)",
+                    [(key, model, vector.tobytes()) for key, vector in entries],
+                )
+                self._db.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM embeddings")
+                self._db.commit()
+
+    def get_stats(self) -> dict[str, int]:
+        """Returns the hit/miss counters and the size of the in-memory tier"""
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "size": len(self._entries),
+        }
+
+    def _put(self, key: str, vector: np.ndarray) -> None:
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _check_model(self, model: str) -> None:
+        """Drops the embeddings of the previous model when the model changes"""
+        if model == self._model:
+            return
+        if self._model is not None:
+            logger.debug(
+                f"Embedding model changed from '{self._model}' to '{model}'; "
+                "invalidating embedding cache"
+            )
+        self._entries.clear()
+        if self._db is not None:
+            self._db.execute("DELETE FROM embeddings WHERE model != ?", (model,))
+            self._db.commit()
+        self._model = model
+
+    def _open_db(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings "
+            "(key TEXT PRIMARY KEY, model TEXT NOT NULL, vector BLOB NOT NULL)"
+        )
+        self._db.commit()
+        logger.debug(f"Opened embedding cache database at {path}")
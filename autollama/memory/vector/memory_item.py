@@ -5,20 +5,23 @@ import json
 from typing import Literal
 
 import numpy as np
-import spacy
 
 from autollama.config import Config
 from autollama.llm import Message
 from autollama.logs import logger
-from autollama.processing.text import chunk_content, split_text, summarize_text
+from autollama.processing.spacy_models import get_spacy_model
+from autollama.processing.text import (
+    chunk_content,
+    split_text,
+    summarize_chunks,
+    summarize_text,
+)
 
 from .utils import Embedding, get_embedding 
 
 MemoryDocType = Literal["webpage", "text_file", "code_file", "agent_history"]
 
-# Load the Spacy model from config
 cfg = Config()
-nlp = spacy.load(cfg.embedding_model)
 
 @dataclasses.dataclass
 class MemoryItem:
@@ -43,7 +46,9 @@ class MemoryItem:
         how_to_summarize: str | None = None,
         question_for_summary: str | None = None,
     ):
-        logger.debug(f"Memorizing text:\n{'-'*32}\n{text}\n{'-'*32}\n")
+        logger.debug(
+            "Memorizing text:\n%s\n%s\n%s\n", "-" * 32, text, "-" * 32, subsystem="memory"
+        )
 
         chunks = [
             chunk
@@ -53,22 +58,14 @@ class MemoryItem:
                 else chunk_content(text, cfg.embedding_model)
             )
         ]
-        logger.debug("Chunks: " + str(chunks))
-
-        chunk_summaries = [
-            summary
-            for summary, _ in [
-                summarize_text(
-                    text_chunk,
-                    instruction=how_to_summarize,
-                    question=question_for_summary,
-                )
-                for text_chunk in chunks
-            ]
-        ]
-        logger.debug("Chunk summaries: " + str(chunk_summaries))
+        logger.debug("Chunks: %s", chunks, subsystem="memory")
 
-        e_chunks = [get_embedding(chunk) for chunk in chunks]
+        chunk_summaries = summarize_chunks(
+            chunks,
+            instruction=how_to_summarize,
+            question=question_for_summary,
+        )
+        logger.debug("Chunk summaries: %s", chunk_summaries, subsystem="memory")
 
         summary = (
             chunk_summaries[0]
@@ -79,9 +76,10 @@ class MemoryItem:
                 question=question_for_summary,
             )[0]
         )
-        logger.debug("Total summary: " + summary)
+        logger.debug("Total summary: %s", summary, subsystem="memory")
 
-        e_summary = get_embedding(summary)
+        # Embed the summary and all chunks in a single batch
+        e_summary, *e_chunks = get_embedding([summary, *chunks])
 
         metadata["source_type"] = source_type
 
@@ -142,7 +140,8 @@ class MemoryItem:
         )
 
     def dump(self) -> str:
-        token_length = len(nlp(self.raw_content))
+        nlp = get_spacy_model(cfg.embedding_model)
+        token_length = len(nlp.make_doc(self.raw_content))
         return f"""
 =============== MemoryItem ===============
 Length: {token_length} tokens in {len(self.e_chunks)} chunks
@@ -171,7 +170,8 @@ class MemoryItemRelevance:
     def of(
         memory_item: MemoryItem, for_query: str, e_query: Embedding | None = None
     ) -> MemoryItemRelevance:
-        e_query = e_query or get_embedding(for_query)
+        if e_query is None:
+            e_query = get_embedding(for_query)
         _, srs, crs = MemoryItemRelevance.calculate_scores(memory_item, e_query)
         return MemoryItemRelevance(
             for_query=for_query,
@@ -192,14 +192,23 @@ class MemoryItemRelevance:
             float: the relevance score of the memory summary
             list: the relevance scores of the memory chunks
         """
-        summary_relevance_score = np.dot(memory.e_summary.vector, compare_to.vector)
-        chunk_relevance_scores = [np.dot(chunk.vector, compare_to.vector) for chunk in memory.e_chunks]
-        logger.debug(f"Relevance of summary: {summary_relevance_score}")
-        logger.debug(f"Relevance of chunks: {chunk_relevance_scores}")
-
-        relevance_scores = [summary_relevance_score, *chunk_relevance_scores]
-        logger.debug(f"Relevance scores: {relevance_scores}")
-        return max(relevance_scores), summary_relevance_score, chunk_relevance_scores
+        embeddings = np.asarray([memory.e_summary, *memory.e_chunks], dtype=np.float32)
+        relevance_scores = embeddings @ np.asarray(compare_to, dtype=np.float32)
+        summary_relevance_score = float(relevance_scores[0])
+        chunk_relevance_scores = relevance_scores[1:].tolist()
+        logger.debug(
+            "Relevance of summary: %s", summary_relevance_score, subsystem="memory"
+        )
+        logger.debug(
+            "Relevance of chunks: %s", chunk_relevance_scores, subsystem="memory"
+        )
+
+        logger.debug("Relevance scores: %s", relevance_scores, subsystem="memory")
+        return (
+            float(relevance_scores.max()),
+            summary_relevance_score,
+            chunk_relevance_scores,
+        )
 
     @property
     def score(self) -> float:
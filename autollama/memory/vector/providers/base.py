@@ -1,3 +1,5 @@
+from __future__ import annotations
+
 import abc
 import functools
 from typing import MutableSet, Sequence, Optional
@@ -30,13 +32,16 @@ class VectorMemoryProvider(MutableSet[MemoryItem], AbstractSingleton):
         results = self.get_relevant(query, 1)
         return results[0] if results else None
 
-    def get_relevant(self, query: str, k: int) -> Sequence[MemoryItemRelevance]:
+    def get_relevant(
+        self, query: str, k: int, e_query: Embedding | None = None
+    ) -> Sequence[MemoryItemRelevance]:
         """
         Retrieves the top-k most relevant memory items for the given query.
 
         Args:
             query: The query to compare stored memories to.
             k: The number of relevant memories to fetch.
+            e_query: The embedding of the query, if already computed.
 
         Returns:
             A list of the top-k MemoryItemRelevance objects.
@@ -49,24 +54,28 @@ class VectorMemoryProvider(MutableSet[MemoryItem], AbstractSingleton):
             f"{len(self)} memories in index"
         )
 
-        relevances = self.score_memories_for_relevance(query)
+        relevances = self.score_memories_for_relevance(query, e_query)
         logger.debug(f"Memory relevance scores: {[str(r) for r in relevances]}")
 
         # Sort by relevance score and get the top k
         top_k_indices = np.argsort([-r.score for r in relevances])[:k]
         return [relevances[i] for i in top_k_indices]
 
-    def score_memories_for_relevance(self, for_query: str) -> Sequence[MemoryItemRelevance]:
+    def score_memories_for_relevance(
+        self, for_query: str, e_query: Embedding | None = None
+    ) -> Sequence[MemoryItemRelevance]:
         """
         Scores all memories in the index for relevance to the given query.
 
         Args:
             for_query: The query to compare stored memories to.
+            e_query: The embedding of the query, if already computed.
 
         Returns:
             A list of MemoryItemRelevance objects for each memory in the index.
         """
-        e_query: Embedding = get_embedding(for_query)
+        if e_query is None:
+            e_query = get_embedding(for_query)
         return [m.relevance_for(for_query, e_query) for m in self]
 
     def get_stats(self) -> tuple[int, int]:
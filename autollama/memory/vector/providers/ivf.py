@@ -0,0 +1,201 @@
+"""Inverted-file (IVF) approximate nearest neighbour memory backend"""
+from __future__ import annotations
+
+from math import isqrt
+from typing import Sequence
+
+import numpy as np
+
+from autollama.config import Config
+from autollama.logs import logger
+
+from ..memory_item import MemoryItem, MemoryItemRelevance
+from ..utils import Embedding
+from .json_file import JSONFileMemory
+
+
+class IVFMemory(JSONFileMemory):
+    """
+    Memory backend that stores memories like JSONFileMemory, but searches them with
+    an inverted-file index instead of scanning every embedding.
+
+    The embeddings are clustered with k-means into `n_lists` inverted lists. A query
+    is only compared to the embeddings in the `n_probe` lists whose centroids match
+    it best: raising `n_probe` increases recall at the cost of latency, and
+    `n_probe >= n_lists` is equivalent to an exact search.
+
+    The index is (re)trained lazily on the first query after the number of stored
+    embeddings has doubled; until there are enough embeddings to cluster, queries
+    fall back to the exact search of JSONFileMemory.
+    """
+
+    # Minimum number of training embeddings per inverted list
+    MIN_ROWS_PER_LIST = 39
+    # Maximum number of embeddings sampled to train the centroids
+    MAX_TRAINING_ROWS_PER_LIST = 256
+    KMEANS_ITERATIONS = 10
+
+    n_lists: int
+    n_probe: int
+
+    _centroids: np.ndarray | None
+    _lists: list[list[int]]
+    _list_arrays: list[np.ndarray | None]
+    _n_trained_rows: int
+
+    def __init__(self, cfg: Config) -> None:
+        if cfg.ivf_n_probe < 1:
+            raise ValueError(
+                f"IVF_N_PROBE must be at least 1, got {cfg.ivf_n_probe}. "
+                "Please check your config."
+            )
+        # 0 lets the number of lists follow the number of embeddings
+        if cfg.ivf_n_lists < 0:
+            raise ValueError(
+                f"IVF_N_LISTS must be at least 1, or 0 for automatic, got "
+                f"{cfg.ivf_n_lists}. Please check your config."
+            )
+        self.n_lists = cfg.ivf_n_lists
+        self.n_probe = cfg.ivf_n_probe
+        super().__init__(cfg)
+
+    def add(self, item: MemoryItem):
+        first_row = self._n_rows
+        n_memories = super().add(item)
+        if self._centroids is not None:
+            self._assign_rows(first_row, self._n_rows)
+        return n_memories
+
+    def compact(self) -> None:
+        super().compact()
+        # Row numbers have changed, so the inverted lists must be rebuilt
+        self._reset_lists()
+
+    def get_relevant(
+        self, query: str, k: int, e_query: Embedding | None = None
+    ) -> Sequence[MemoryItemRelevance]:
+        """
+        Retrieves the approximate top-k most relevant memory items for the query.
+
+        Args:
+            query: The query to compare stored memories to.
+            k: The number of relevant memories to fetch.
+            e_query: The embedding of the query, if already computed.
+
+        Returns:
+            A list of (at most) k MemoryItemRelevance objects, most relevant first.
+        """
+        if not self or k < 1:
+            return []
+
+        if self._needs_training():
+            self.train()
+        if self._centroids is None or self.n_probe >= len(self._centroids):
+            return super().get_relevant(query, k, e_query)
+
+        logger.debug(
+            f"Searching for {k} relevant memories for query '{query}' in "
+            f"{self.n_probe}/{len(self._centroids)} inverted lists; "
+            f"{len(self)} memories in index"
+        )
+
+        q = self._query_vector(query, e_query)
+        probed_lists = np.argpartition(-(self._centroids @ q), self.n_probe - 1)
+        candidate_rows = np.sort(
+            np.concatenate([self._list_array(i) for i in probed_lists[: self.n_probe]])
+        )
+        if not len(candidate_rows):
+            return []
+
+        # Aggregate the candidate rows into per-memory (max) scores
+        row_scores = self._matrix[candidate_rows] @ q
+        row_entries = np.searchsorted(self._offsets, candidate_rows, side="right") - 1
+        entries, starts = np.unique(row_entries, return_index=True)
+        entry_scores = np.maximum.reduceat(row_scores, starts)
+        if self._n_live < len(self._entries):
+            deleted = np.asarray([self._entries[i].deleted for i in entries])
+            entry_scores[deleted] = -np.inf
+
+        k = min(k, int(np.count_nonzero(entry_scores > -np.inf)))
+        if k < 1:
+            return []
+        top_k = np.argpartition(-entry_scores, k - 1)[:k]
+        top_k = top_k[np.argsort(-entry_scores[top_k])]
+
+        # Score the winners exactly, including their chunks outside the probed lists
+        return [
+            self._relevance_of(i, query, self._entry_rows(i) @ q)
+            for i in entries[top_k]
+        ]
+
+    def train(self) -> None:
+        """Clusters the stored embeddings and rebuilds the inverted lists"""
+        n_lists = self.n_lists or max(1, isqrt(self._n_rows))
+        n_lists = min(n_lists, self._n_rows // self.MIN_ROWS_PER_LIST)
+        if n_lists < 2:
+            self._reset_lists()
+            return
+
+        logger.debug(
+            f"Training IVF index with {n_lists} lists on {self._n_rows} embeddings"
+        )
+        rng = np.random.default_rng(42)
+        n_samples = min(self._n_rows, n_lists * self.MAX_TRAINING_ROWS_PER_LIST)
+        samples = np.asarray(
+            self._matrix[np.sort(rng.choice(self._n_rows, n_samples, replace=False))]
+        )
+
+        # Spherical k-means: centroids are kept on the unit sphere, so that assigning
+        # embeddings by inner product doesn't favour lists by centroid length
+        centroids = _normalize(samples[rng.choice(n_samples, n_lists, replace=False)])
+        for _ in range(self.KMEANS_ITERATIONS):
+            assignments = np.argmax(samples @ centroids.T, axis=1)
+            order = np.argsort(assignments, kind="stable")
+            non_empty, starts = np.unique(assignments[order], return_index=True)
+            sums = np.add.reduceat(samples[order], starts)
+            centroids[non_empty] = _normalize(sums)
+
+        self._centroids = centroids
+        self._lists = [[] for _ in range(n_lists)]
+        self._list_arrays = [None] * n_lists
+        self._n_trained_rows = self._n_rows
+        self._assign_rows(0, self._n_rows)
+
+    def _needs_training(self) -> bool:
+        if self._centroids is None:
+            return self._n_rows >= 2 * self.MIN_ROWS_PER_LIST
+        return self._n_rows >= 2 * self._n_trained_rows
+
+    def _assign_rows(self, start: int, end: int) -> None:
+        """Adds embedding rows [start, end) to the inverted list of their centroid"""
+        batch_size = 4096
+        for batch_start in range(start, end, batch_size):
+            batch_end = min(batch_start + batch_size, end)
+            assignments = np.argmax(
+                self._matrix[batch_start:batch_end] @ self._centroids.T, axis=1
+            )
+            for row, list_id in enumerate(assignments.tolist(), start=batch_start):
+                self._lists[list_id].append(row)
+                self._list_arrays[list_id] = None
+
+    def _list_array(self, list_id: int) -> np.ndarray:
+        if self._list_arrays[list_id] is None:
+            self._list_arrays[list_id] = np.asarray(
+                self._lists[list_id], dtype=np.int64
+            )
+        return self._list_arrays[list_id]
+
+    def _reset_index(self) -> None:
+        super()._reset_index()
+        self._reset_lists()
+
+    def _reset_lists(self) -> None:
+        self._centroids = None
+        self._lists = []
+        self._list_arrays = []
+        self._n_trained_rows = 0
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, np.finfo(np.float32).tiny)
@@ -1,24 +1,61 @@
 from __future__ import annotations
 
+import dataclasses
+import hashlib
+import os
 from pathlib import Path
-from typing import Iterator
+from typing import Iterator, Optional, Sequence
 
+import numpy as np
 import orjson
 
 from autollama.config import Config
 from autollama.logs import logger
 
-from ..memory_item import MemoryItem
+from ..memory_item import MemoryItem, MemoryItemRelevance
+from ..utils import Embedding, get_embedding
 from .base import VectorMemoryProvider
 
 
+@dataclasses.dataclass
+class _IndexEntry:
+    """Location of a stored memory in the metadata log and the embedding file"""
+
+    row: int
+    n_rows: int
+    log_offset: int
+    # Hash of the memory's content, which identifies it without reading it
+    content_hash: Optional[bytes] = None
+    item: Optional[MemoryItem] = None
+    deleted: bool = False
+
+
 class JSONFileMemory(VectorMemoryProvider):
-    """Memory backend that stores memories in a JSON file"""
+    """
+    Memory backend that stores memories in an append-only segment on disk:
+
+    * `<memory_index>.jsonl`: a metadata log with one `add` record per memory
+      (its text content, a hash of it and the embedding rows it occupies) and one
+      `del` record per discarded memory.
+    * `<memory_index>.npy`: a memory-mapped float32 matrix holding all summary and
+      chunk embeddings, one row each, stored contiguously per memory.
+
+    Adding a memory only appends to both files, existing memories are reloaded
+    lazily on startup, and `compact()` folds discarded entries out of the segment.
+    """
 
-    SAVE_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_SERIALIZE_DATACLASS
+    # Fraction of dead embedding rows above which discard() compacts the segment
+    COMPACTION_THRESHOLD = 0.5
 
-    file_path: Path
-    memories: list[MemoryItem]
+    log_path: Path
+    embeddings_path: Path
+
+    _entries: list[_IndexEntry]
+    # Embedding matrix: row `_offsets[i]` holds the summary embedding of entry `i`,
+    # the next `_entries[i].n_rows - 1` rows hold its chunk embeddings.
+    _matrix: np.ndarray
+    _n_rows: int
+    _offsets: list[int]
 
     def __init__(self, cfg: Config) -> None:
         """Initialize a class instance
@@ -30,39 +67,384 @@ class JSONFileMemory(VectorMemoryProvider):
             None
         """
         workspace_path = Path(cfg.workspace_path)
-        self.file_path = workspace_path / f"{cfg.memory_index}.json"
-        self.file_path.touch()
-        logger.debug(f"Initialized {__name__} with index path {self.file_path}")
+        self.log_path = workspace_path / f"{cfg.memory_index}.jsonl"
+        self.embeddings_path = workspace_path / f"{cfg.memory_index}.npy"
+        self.log_path.touch()
+        logger.debug(f"Initialized {__name__} with index path {self.log_path}")
 
-        self.memories = []
-        self.save_index()
+        self._load_index()
 
     def __iter__(self) -> Iterator[MemoryItem]:
-        return iter(self.memories)
+        return (self._item_of(entry) for entry in self._entries if not entry.deleted)
 
     def __contains__(self, x: MemoryItem) -> bool:
-        return x in self.memories
+        return self._find_entry(x) is not None
 
     def __len__(self) -> int:
-        return len(self.memories)
+        return self._n_live
+
+    @property
+    def memories(self) -> list[MemoryItem]:
+        return list(self)
 
     def add(self, item: MemoryItem):
-        self.memories.append(item)
-        self.save_index()
-        return len(self.memories)
+        vectors = np.asarray([item.e_summary, *item.e_chunks], dtype=np.float32)
+        row = self._n_rows
+        self._append_rows(vectors)
+
+        # The log record is written after the embeddings it refers to, so that an
+        # interrupted write never leaves the log pointing at missing rows
+        payload = self._payload_of(item)
+        content_hash = _hash(payload)
+        log_offset = self._append_log(
+            b"add %d %d %s " % (row, len(vectors), content_hash), payload
+        )
+
+        self._entries.append(
+            _IndexEntry(row, len(vectors), log_offset, content_hash, item)
+        )
+        self._offsets.append(row)
+        self._n_live += 1
+        return self._n_live
 
     def discard(self, item: MemoryItem):
-        try:
-            self.remove(item)
-        except:
-            pass
+        i = self._find_entry(item)
+        if i is None:
+            return
+
+        self._append_log(b"del %d" % i)
+        self._entries[i].deleted = True
+        self._entries[i].item = None
+        self._n_live -= 1
+        self._n_dead_rows += self._entries[i].n_rows
+
+        if self._n_dead_rows > self.COMPACTION_THRESHOLD * self._n_rows:
+            self.compact()
 
     def clear(self):
         """Clears the data in memory."""
-        self.memories.clear()
-        self.save_index()
+        self.log_path.write_bytes(b"")
+        self._close_matrix()
+        self.embeddings_path.unlink(missing_ok=True)
+        self._reset_index()
+
+    def compact(self) -> None:
+        """Rewrites the segment without the entries that have been discarded"""
+        live_entries = [entry for entry in self._entries if not entry.deleted]
+        logger.debug(
+            f"Compacting memory index {self.log_path}: "
+            f"keeping {len(live_entries)} of {len(self._entries)} entries"
+        )
+
+        tmp_log_path = self.log_path.with_suffix(".jsonl.tmp")
+        tmp_embeddings_path = self.embeddings_path.with_suffix(".npy.tmp")
+
+        n_rows = sum(entry.n_rows for entry in live_entries)
+        matrix = None
+        if n_rows:
+            matrix = np.lib.format.open_memmap(
+                tmp_embeddings_path,
+                mode="w+",
+                dtype=np.float32,
+                shape=(n_rows, self._matrix.shape[1]),
+            )
+
+        row = 0
+        with self._open_log() as old_log, tmp_log_path.open("wb") as new_log:
+            for entry in live_entries:
+                old_log.seek(entry.log_offset)
+                payload = old_log.readline().rstrip(b"\n")
+                matrix[row : row + entry.n_rows] = self._matrix[
+                    entry.row : entry.row + entry.n_rows
+                ]
+                entry.content_hash = _hash(payload)
+                new_log.write(
+                    b"add %d %d %s " % (row, entry.n_rows, entry.content_hash)
+                )
+                entry.log_offset = new_log.tell()
+                new_log.write(payload + b"\n")
+                entry.row = row
+                row += entry.n_rows
+
+        self._close_matrix()
+        if matrix is not None:
+            matrix.flush()
+            del matrix
+            os.replace(tmp_embeddings_path, self.embeddings_path)
+        else:
+            self.embeddings_path.unlink(missing_ok=True)
+        os.replace(tmp_log_path, self.log_path)
+
+        self._entries = live_entries
+        self._offsets = [entry.row for entry in live_entries]
+        self._n_rows = row
+        self._n_dead_rows = 0
+        self._open_matrix()
+
+    def get_relevant(
+        self, query: str, k: int, e_query: Embedding | None = None
+    ) -> Sequence[MemoryItemRelevance]:
+        """
+        Retrieves the top-k most relevant memory items for the given query.
+
+        All stored embeddings are scored with a single matrix-vector product;
+        MemoryItemRelevance objects are only built for the k best memories.
+
+        Args:
+            query: The query to compare stored memories to.
+            k: The number of relevant memories to fetch.
+            e_query: The embedding of the query, if already computed.
+
+        Returns:
+            A list of the top-k MemoryItemRelevance objects, most relevant first.
+        """
+        if not self or k < 1:
+            return []
+
+        logger.debug(
+            f"Searching for {k} relevant memories for query '{query}'; "
+            f"{len(self)} memories in index"
+        )
+
+        row_scores = self._score_rows(query, e_query)
+        memory_scores = self._score_entries(row_scores)
+
+        k = min(k, self._n_live)
+        top_k_indices = np.argpartition(-memory_scores, k - 1)[:k]
+        top_k_indices = top_k_indices[np.argsort(-memory_scores[top_k_indices])]
+
+        return [
+            self._relevance_of(i, query, row_scores[self._entry_slice(i)])
+            for i in top_k_indices
+        ]
+
+    def score_memories_for_relevance(
+        self, for_query: str, e_query: Embedding | None = None
+    ) -> Sequence[MemoryItemRelevance]:
+        """
+        Scores all memories in the index for relevance to the given query.
+
+        Args:
+            for_query: The query to compare stored memories to.
+            e_query: The embedding of the query, if already computed.
+
+        Returns:
+            A list of MemoryItemRelevance objects for each memory in the index.
+        """
+        if not self:
+            return []
+
+        row_scores = self._score_rows(for_query, e_query)
+        return [
+            self._relevance_of(i, for_query, row_scores[self._entry_slice(i)])
+            for i, entry in enumerate(self._entries)
+            if not entry.deleted
+        ]
+
+    def get_stats(self) -> tuple[int, int]:
+        n_live_rows = self._n_rows - self._n_dead_rows
+        return self._n_live, n_live_rows - self._n_live
 
     def save_index(self):
-        logger.debug(f"Saving memory index to file {self.file_path}")
-        with self.file_path.open("wb") as f:
-            return f.write(orjson.dumps(self.memories, option=self.SAVE_OPTIONS))
+        logger.debug(f"Flushing memory index to {self.embeddings_path}")
+        if isinstance(self._matrix, np.memmap):
+            self._matrix.flush()
+
+    def _score_rows(
+        self, query: str, e_query: Embedding | None = None
+    ) -> np.ndarray:
+        """Returns the relevance score of every embedding row for the given query"""
+        return self._matrix[: self._n_rows] @ self._query_vector(query, e_query)
+
+    @staticmethod
+    def _query_vector(query: str, e_query: Embedding | None = None) -> np.ndarray:
+        if e_query is None:
+            e_query = get_embedding(query)
+        return np.asarray(e_query, dtype=np.float32)
+
+    def _score_entries(self, row_scores: np.ndarray) -> np.ndarray:
+        """Reduces row scores to the aggregate (max) score of every entry"""
+        entry_scores = np.maximum.reduceat(row_scores, self._offsets)
+        if self._n_live < len(self._entries):
+            deleted = [entry.deleted for entry in self._entries]
+            entry_scores[np.asarray(deleted)] = -np.inf
+        return entry_scores
+
+    def _relevance_of(
+        self, entry_index: int, query: str, entry_scores: np.ndarray
+    ) -> MemoryItemRelevance:
+        """Builds a MemoryItemRelevance from the scores of an entry's embedding rows"""
+        return MemoryItemRelevance(
+            memory_item=self._item_of(self._entries[entry_index]),
+            for_query=query,
+            summary_relevance_score=float(entry_scores[0]),
+            chunk_relevance_scores=entry_scores[1:].tolist(),
+        )
+
+    def _entry_slice(self, entry_index: int) -> slice:
+        entry = self._entries[entry_index]
+        return slice(entry.row, entry.row + entry.n_rows)
+
+    def _entry_rows(self, entry_index: int) -> np.ndarray:
+        return self._matrix[self._entry_slice(entry_index)]
+
+    def _find_entry(self, item: MemoryItem) -> Optional[int]:
+        """Finds a memory by its content, without reading the stored memories.
+
+        Embeddings are left out of the match, since they are rounded to float32 when
+        stored."""
+        content_hash = _hash(self._payload_of(item))
+        for i, entry in enumerate(self._entries):
+            if entry.deleted:
+                continue
+            if entry.item is item or self._hash_of(entry) == content_hash:
+                return i
+        return None
+
+    def _hash_of(self, entry: _IndexEntry) -> bytes:
+        if entry.content_hash is None:
+            with self._open_log() as log:
+                log.seek(entry.log_offset)
+                entry.content_hash = _hash(log.readline().rstrip(b"\n"))
+        return entry.content_hash
+
+    @staticmethod
+    def _payload_of(item: MemoryItem) -> bytes:
+        """Serializes the content of a memory for its record in the metadata log"""
+        return orjson.dumps(
+            {
+                "raw_content": item.raw_content,
+                "summary": item.summary,
+                "chunks": item.chunks,
+                "chunk_summaries": item.chunk_summaries,
+                "metadata": item.metadata,
+            },
+            option=orjson.OPT_SERIALIZE_NUMPY,
+        )
+
+    def _item_of(self, entry: _IndexEntry) -> MemoryItem:
+        """Returns the MemoryItem of an entry, reading it from disk on first access"""
+        if entry.item is None:
+            with self._open_log() as log:
+                log.seek(entry.log_offset)
+                data = orjson.loads(log.readline())
+
+            vectors = self._matrix[entry.row : entry.row + entry.n_rows]
+            entry.item = MemoryItem(
+                raw_content=data["raw_content"],
+                summary=data["summary"],
+                chunks=data["chunks"],
+                chunk_summaries=data["chunk_summaries"],
+                e_summary=vectors[0].tolist(),
+                e_chunks=[v.tolist() for v in vectors[1:]],
+                metadata=data["metadata"],
+            )
+        return entry.item
+
+    def _reset_index(self) -> None:
+        self._entries = []
+        self._offsets = []
+        self._matrix = np.empty((0, 0), dtype=np.float32)
+        self._n_rows = 0
+        self._n_live = 0
+        self._n_dead_rows = 0
+
+    def _load_index(self) -> None:
+        """Replays the metadata log; memory contents are only read when accessed"""
+        self._reset_index()
+
+        with self._open_log() as log:
+            offset = 0
+            for line in log:
+                if not line.endswith(b"\n"):
+                    break
+                op, _, rest = line.partition(b" ")
+                if op == b"add":
+                    row, n_rows, rest = rest.split(b" ", 2)
+                    header = b"add %s %s " % (row, n_rows)
+                    content_hash = None
+                    # Records written before content hashes were recorded have none
+                    if not rest.startswith(b"{"):
+                        content_hash, _, _ = rest.partition(b" ")
+                        header += content_hash + b" "
+                    self._entries.append(
+                        _IndexEntry(
+                            int(row), int(n_rows), offset + len(header), content_hash
+                        )
+                    )
+                elif op == b"del":
+                    entry = self._entries[int(rest)]
+                    entry.deleted = True
+                    self._n_dead_rows += entry.n_rows
+                offset += len(line)
+
+        if offset < self.log_path.stat().st_size:
+            logger.warn(f"Discarding incomplete trailing record in {self.log_path}")
+            with self.log_path.open("r+b") as log:
+                log.truncate(offset)
+
+        self._offsets = [entry.row for entry in self._entries]
+        self._n_live = sum(not entry.deleted for entry in self._entries)
+        if self._entries:
+            last_entry = self._entries[-1]
+            self._n_rows = last_entry.row + last_entry.n_rows
+        self._open_matrix()
+
+        logger.debug(
+            f"Loaded {self._n_live} memories ({self._n_rows} embeddings) "
+            f"from {self.log_path}"
+        )
+
+    def _open_log(self):
+        return self.log_path.open("rb")
+
+    def _append_log(self, header: bytes, payload: bytes = b"") -> int:
+        """Appends a record to the metadata log and returns the offset of its payload"""
+        with self.log_path.open("ab") as log:
+            log.write(header)
+            payload_offset = log.tell()
+            log.write(payload + b"\n")
+        return payload_offset
+
+    def _open_matrix(self) -> None:
+        if self.embeddings_path.exists():
+            self._matrix = np.load(self.embeddings_path, mmap_mode="r+")
+        else:
+            self._matrix = np.empty((0, 0), dtype=np.float32)
+
+    def _close_matrix(self) -> None:
+        """Unmaps the embedding file, which can't be replaced while mapped on Windows"""
+        if isinstance(self._matrix, np.memmap) and self._matrix._mmap is not None:
+            self._matrix.flush()
+            self._matrix._mmap.close()
+        self._matrix = np.empty((0, 0), dtype=np.float32)
+
+    def _append_rows(self, vectors: np.ndarray) -> None:
+        """Writes embedding rows to the end of the memory-mapped embedding file"""
+        n_new_rows, dimensions = vectors.shape
+
+        if self._n_rows + n_new_rows > self._matrix.shape[0]:
+            # Grow geometrically so that adding a memory stays amortized O(item)
+            capacity = max(2 * self._matrix.shape[0], self._n_rows + n_new_rows, 64)
+            tmp_embeddings_path = self.embeddings_path.with_suffix(".npy.tmp")
+            matrix = np.lib.format.open_memmap(
+                tmp_embeddings_path,
+                mode="w+",
+                dtype=np.float32,
+                shape=(capacity, dimensions),
+            )
+            if self._n_rows:
+                matrix[: self._n_rows] = self._matrix[: self._n_rows]
+            matrix.flush()
+            del matrix
+            self._close_matrix()
+            os.replace(tmp_embeddings_path, self.embeddings_path)
+            self._open_matrix()
+
+        self._matrix[self._n_rows : self._n_rows + n_new_rows] = vectors
+        self._matrix.flush()
+        self._n_rows += n_new_rows
+
+
+def _hash(payload: bytes) -> bytes:
+    return hashlib.sha256(payload).hexdigest().encode()
@@ -1,16 +1,16 @@
 from typing import Any, List, Union, overload
 import numpy as np
-import spacy
 from autollama.config import Config
 from autollama.logs import logger
+from autollama.processing.spacy_models import get_spacy_model
+
+from .embedding_cache import EmbeddingCache
 
 # Define the Embedding type
 Embedding = Union[List[np.float32], np.ndarray[Any, np.dtype[np.float32]]]
 TText = List[int]  # Token array representing text
 
-# Load the Spacy model once using the model defined in the config
 cfg = Config()
-nlp = spacy.load(cfg.embedding_model)
 
 @overload
 def get_embedding(input: str) -> Embedding: ...
@@ -45,14 +45,53 @@ def get_embedding(
         input = [text.replace("\n", " ") for text in input]
 
     logger.debug(
-        f"Getting embedding{'s' if multiple else ''} "
-        f"for {'multiple inputs' if multiple else 'a single input'} "
-        f"with Spacy model '{cfg.embedding_model}'"
+        "Getting embedding%s for %s with Spacy model '%s'",
+        "s" if multiple else "",
+        "multiple inputs" if multiple else "a single input",
+        cfg.embedding_model,
+        subsystem="memory",
     )
 
-    if multiple:
-        # Process a list of inputs using Spacy's pipeline for efficiency
-        return [doc.vector.tolist() for doc in nlp.pipe(input)]
+    texts = input if multiple else [input]
+    if isinstance(texts[0], str):
+        vectors = _embed_with_cache(texts)
     else:
+        vectors = _embed(texts)
+
+    return [v.tolist() for v in vectors] if multiple else vectors[0].tolist()
+
+
+def _embed_with_cache(texts: List[str]) -> List[np.ndarray]:
+    """Embeds the given texts, only running the Spacy model on cache misses"""
+    model = cfg.embedding_model
+    cache = EmbeddingCache()
+
+    vectors = [cache.get(model, text) for text in texts]
+    missing = [i for i, vector in enumerate(vectors) if vector is None]
+    if missing:
+        missing_texts = [texts[i] for i in missing]
+        missing_vectors = _embed(missing_texts)
+        cache.set_many(model, missing_texts, missing_vectors)
+        for i, vector in zip(missing, missing_vectors):
+            vectors[i] = vector
+    return vectors
+
+
+def _embed(texts: list) -> List[np.ndarray]:
+    # Doc vectors are averaged from the static word vectors, which only requires
+    # tokenization: the model is loaded without tagger, parser, NER etc.
+    nlp = get_spacy_model(cfg.embedding_model)
+
+    if len(texts) == 1:
         # Process a single input
-        return nlp(input).vector.tolist()
+        return [nlp(texts[0]).vector]
+
+    # Process a list of inputs in batches using Spacy's pipeline for efficiency
+    return [
+        doc.vector
+        for doc in nlp.pipe(
+            texts,
+            batch_size=cfg.embedding_batch_size,
+            n_process=cfg.embedding_n_process,
+        )
+    ]
@@ -0,0 +1,61 @@
+"""Process-wide registry of lazily loaded spaCy models"""
+from __future__ import annotations
+
+import threading
+
+import spacy
+from spacy.language import Language
+
+from autollama.logs import logger
+
+# Trained components that are excluded from loading unless explicitly requested.
+# Tokenization and static word vectors (doc.vector) work without any of them.
+TRAINED_COMPONENTS = (
+    "tok2vec",
+    "transformer",
+    "tagger",
+    "morphologizer",
+    "parser",
+    "senter",
+    "attribute_ruler",
+    "lemmatizer",
+    "ner",
+    "entity_ruler",
+    "textcat",
+    "spancat",
+)
+
+_models: dict[tuple[str, tuple[str, ...]], Language] = {}
+_lock = threading.Lock()
+
+
+def get_spacy_model(name: str, pipes: tuple[str, ...] = ()) -> Language:
+    """Get a spaCy model, loading it on first use.
+
+    Each model is loaded only once per process for a given set of pipes. Trained
+    components that are not in `pipes` are excluded when loading; pipes that are not
+    part of the model (e.g. "sentencizer") are added from their factory.
+
+    Args:
+        name (str): The name of the spaCy model, e.g. "en_core_web_sm"
+        pipes (tuple[str, ...]): The pipeline components the caller needs.
+            Defaults to none: tokenizer and word vectors only.
+
+    Returns:
+        Language: The loaded spaCy model
+    """
+    key = (name, tuple(pipes))
+    if (nlp := _models.get(key)) is not None:
+        return nlp
+
+    with _lock:
+        if (nlp := _models.get(key)) is None:
+            logger.debug(f"Loading spaCy model '{name}' with pipes {list(pipes)}")
+            nlp = spacy.load(
+                name, exclude=[c for c in TRAINED_COMPONENTS if c not in pipes]
+            )
+            for pipe in pipes:
+                if pipe not in nlp.pipe_names:
+                    nlp.add_pipe(pipe)
+            _models[key] = nlp
+    return nlp
@@ -1,28 +1,37 @@
 """Text processing functions"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from math import ceil
 from typing import Optional, List, Tuple
 
-import spacy
-
 from autollama.config import Config
 from autollama.llm.base import ChatSequence
 from autollama.llm.providers.groq import GROQ_MODELS
 from autollama.llm.utils import count_string_tokens, create_chat_completion
 from autollama.logs import logger
+from autollama.processing.spacy_models import get_spacy_model
 from autollama.utils import batch
 
 CFG = Config()
 
+# Bounds the summarization requests in flight across all threads, including those
+# of nested summarize_chunks calls, to SUMMARIZATION_CONCURRENCY
+_SUMMARIZATION_SLOTS = threading.BoundedSemaphore(
+    max(1, CFG.summarization_concurrency)
+)
+
 def _max_chunk_length(model: str, max: Optional[int] = None) -> int:
     model_max_input_tokens = GROQ_MODELS[model].max_tokens - 1
     max_length = min(max, model_max_input_tokens) if max else model_max_input_tokens
-    logger.debug(f"Max chunk length for model {model}: {max_length}")
+    logger.debug("Max chunk length for model %s: %d", model, max_length, subsystem="processing")
     return max_length
 
 def must_chunk_content(text: str, for_model: str, max_chunk_length: Optional[int] = None) -> bool:
     tokens = count_string_tokens(text, for_model)
     needs_chunking = tokens > _max_chunk_length(for_model, max_chunk_length)
-    logger.debug(f"Text requires chunking: {needs_chunking} (tokens: {tokens})")
+    logger.debug(
+        "Text requires chunking: %s (tokens: %d)", needs_chunking, tokens, subsystem="processing"
+    )
     return needs_chunking
 
 def chunk_content(
@@ -36,19 +45,21 @@ def chunk_content(
 
     if not must_chunk_content(content, for_model, max_chunk_length):
         length = count_string_tokens(content, for_model)
-        logger.debug(f"Content does not require chunking. Length: {length}")
+        logger.debug("Content does not require chunking. Length: %d", length, subsystem="processing")
         return [(content, length)]
 
     max_chunk_length = max_chunk_length or _max_chunk_length(for_model)
-    logger.debug(f"Max chunk length set to: {max_chunk_length}")
+    logger.debug("Max chunk length set to: %d", max_chunk_length, subsystem="processing")
 
     # Using spacy for tokenization
-    nlp = spacy.load(CFG.browse_spacy_language_model)
+    nlp = get_spacy_model(CFG.browse_spacy_language_model)
     doc = nlp(content)
     tokenized_text = [token.text for token in doc]
     total_length = len(tokenized_text)
     n_chunks = ceil(total_length / max_chunk_length)
-    logger.debug(f"Total tokens: {total_length}, Number of chunks: {n_chunks}")
+    logger.debug(
+        "Total tokens: %d, Number of chunks: %d", total_length, n_chunks, subsystem="processing"
+    )
 
     chunk_length = ceil(total_length / n_chunks)
     overlap = min(max_chunk_length - chunk_length, MAX_OVERLAP) if with_overlap else 0
@@ -57,7 +68,7 @@ def chunk_content(
     for token_batch in batch(tokenized_text, chunk_length + overlap, overlap):
         chunk = "".join(token_batch)
         chunks.append((chunk, len(token_batch)))
-        logger.debug(f"Created chunk of length {len(token_batch)}")
+        logger.debug("Created chunk of length %d", len(token_batch), subsystem="processing")
 
     return chunks
 
@@ -98,25 +109,22 @@ def summarize_text(
             "CONCISE SUMMARY: The text is best summarized as"
         )
 
-        logger.debug(f"Summarizing with {model}:\n{summarization_prompt.dump()}\n")
-        summary = create_chat_completion(
-            summarization_prompt, temperature=0, max_tokens=500
+        logger.debug(
+            lambda: f"Summarizing with {model}:\n{summarization_prompt.dump()}\n",
+            subsystem="processing",
         )
+        with _SUMMARIZATION_SLOTS:
+            summary = create_chat_completion(
+                summarization_prompt, temperature=0, max_tokens=500, caller="summarize"
+            )
 
-        logger.debug(f"\n{'-'*16} SUMMARY {'-'*17}\n{summary}\n{'-'*42}\n")
+        logger.debug(
+            "\n%s SUMMARY %s\n%s\n%s\n", "-" * 16, "-" * 17, summary, "-" * 42, subsystem="processing"
+        )
         return summary.strip(), None
 
-    summaries: List[str] = []
     chunks = list(split_text(text, for_model=model, max_chunk_length=max_chunk_length))
-
-    for i, (chunk, chunk_length) in enumerate(chunks):
-        logger.info(
-            f"Summarizing chunk {i + 1} / {len(chunks)} of length {chunk_length} tokens"
-        )
-        summary, _ = summarize_text(chunk, instruction)
-        summaries.append(summary)
-
-    logger.info(f"Summarized {len(chunks)} chunks")
+    summaries = summarize_chunks([chunk for chunk, _ in chunks], instruction)
 
     final_summary, _ = summarize_text("\n\n".join(summaries))
 
@@ -124,6 +132,34 @@ def summarize_text(
         (summaries[i], chunks[i][0]) for i in range(len(chunks))
     ]
 
+def summarize_chunks(
+    chunks: List[str],
+    instruction: Optional[str] = None,
+    question: Optional[str] = None,
+) -> List[str]:
+    """Summarize text chunks concurrently, returning the summaries in chunk order.
+
+    At most SUMMARIZATION_CONCURRENCY chunks are summarized at the same time, even
+    when the summary of an oversized chunk is itself summarized in chunks.
+    """
+
+    def summarize_chunk(i: int) -> str:
+        logger.info(f"Summarizing chunk {i + 1} / {len(chunks)}")
+        summary, _ = summarize_text(chunks[i], instruction, question)
+        return summary
+
+    max_workers = min(len(chunks), CFG.summarization_concurrency)
+    if max_workers <= 1:
+        summaries = [summarize_chunk(i) for i in range(len(chunks))]
+    else:
+        with ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="summarize"
+        ) as executor:
+            summaries = list(executor.map(summarize_chunk, range(len(chunks))))
+
+    logger.info(f"Summarized {len(chunks)} chunks")
+    return summaries
+
 def split_text(
     text: str,
     for_model: str = CFG.llm_model,
@@ -136,18 +172,17 @@ def split_text(
     # Flatten paragraphs to improve performance
     text = text.replace("\n", " ")
     text_length = count_string_tokens(text, for_model)
-    logger.debug(f"Text length after flattening: {text_length} tokens")
+    logger.debug("Text length after flattening: %d tokens", text_length, subsystem="processing")
 
     if text_length < max_length:
-        logger.debug(f"Text is short enough to not require splitting.")
+        logger.debug("Text is short enough to not require splitting.", subsystem="processing")
         return [(text, text_length)]
 
     n_chunks = ceil(text_length / max_length)
     target_chunk_length = ceil(text_length / n_chunks)
-    logger.debug(f"Target chunk length: {target_chunk_length} tokens")
+    logger.debug("Target chunk length: %d tokens", target_chunk_length, subsystem="processing")
 
-    nlp = spacy.load(CFG.browse_spacy_language_model)
-    nlp.add_pipe("sentencizer")
+    nlp = get_spacy_model(CFG.browse_spacy_language_model, ("sentencizer",))
     doc = nlp(text)
     sentences = [sentence.text.strip() for sentence in doc.sents]
 
@@ -210,5 +245,5 @@ def split_text(
     if current_chunk:
         chunks.append((" ".join(current_chunk), current_chunk_length))
     
-    logger.debug(f"Total chunks created: {len(chunks)}")
+    logger.debug("Total chunks created: %d", len(chunks), subsystem="processing")
     return chunks
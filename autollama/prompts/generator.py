@@ -36,6 +36,18 @@ class PromptGenerator:
             "command": {"name": "command name", "args": {"arg name": "value"}},
         }
 
+    def use_command_list(self) -> None:
+        """
+        Ask for a list of commands in each response instead of a single command,
+            so that independent commands can be executed concurrently.
+        """
+        command_format = self.response_format.pop("command")
+        self.response_format["commands"] = [command_format]
+        self.add_constraint(
+            'To run several independent commands at once, list them all in "commands";'
+            " their results will be returned in the same order"
+        )
+
     def add_constraint(self, constraint: str) -> None:
         """
         Add a constraint to the constraints list.
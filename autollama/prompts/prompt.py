@@ -43,6 +43,9 @@ def build_default_prompt_generator() -> PromptGenerator:
     for performance_evaluation in prompt_config.performance_evaluations:
         prompt_generator.add_performance_evaluation(performance_evaluation)
 
+    if CFG.parallel_commands:
+        prompt_generator.use_command_list()
+
     return prompt_generator
 
 
@@ -162,7 +162,8 @@ def generate_aiconfig_automatic(user_prompt) -> AIConfig:
                 Message("system", system_prompt),
                 Message("user", prompt_ai_config_automatic),
             ],
-        )
+        ),
+        caller="setup",
     )
 
     # Debug LLM Output
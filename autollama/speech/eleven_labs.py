@@ -83,6 +83,6 @@ class ElevenLabsSpeech(VoiceBase):
             os.remove("speech.mpeg")
             return True
         else:
-            logger.warn("Request failed with status code:", response.status_code)
-            logger.info("Response content:", response.content)
+            logger.warn("Request failed with status code: %s", response.status_code)
+            logger.info("Response content: %s", response.content)
             return False
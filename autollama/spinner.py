@@ -4,6 +4,7 @@ import sys
 import threading
 import time
 
+from autollama.logs import logger
 
 class Spinner:
     """A simple spinner class"""
@@ -30,6 +31,10 @@ class Spinner:
 
     def spin(self) -> None:
         """Spin the spinner"""
+        # Let the console output still queued in the logger, e.g. the typing of the
+        # previous messages, finish before taking over the terminal line. This is
+        # done in the spinner's thread, so the caller doesn't wait for it.
+        logger.flush()
         if self.plain_output:
             self.print_message()
             return
@@ -23,6 +23,8 @@ def clean_input(prompt: str = "", talk=False):
         cfg = Config()      
         # ask for input, default when just pressing Enter is y
         logger.info("Asking user via keyboard...")
+        # Show everything logged so far before the prompt
+        logger.flush()
         answer = input(prompt)
         return answer
     except KeyboardInterrupt:
@@ -0,0 +1,81 @@
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+# Registers the commands in a fresh interpreter, where the rest of the app is
+# already imported, and reports what the registration cost
+REGISTER_COMMANDS = """
+import json
+import sys
+import time
+
+from autollama.commands.command import CommandRegistry
+from autollama.commands.manifest import COMMAND_MANIFEST
+from autollama.main import COMMAND_CATEGORIES
+
+lazy = sys.argv[1] == "lazy"
+modules = len(sys.modules)
+start = time.perf_counter()
+command_registry = CommandRegistry()
+for command_category in COMMAND_CATEGORIES:
+    if lazy and command_category in COMMAND_MANIFEST:
+        command_registry.register_manifest(
+            command_category, COMMAND_MANIFEST[command_category]
+        )
+    else:
+        command_registry.import_commands(command_category)
+print(
+    json.dumps(
+        {
+            "seconds": time.perf_counter() - start,
+            "modules": len(sys.modules) - modules,
+            "prompt": command_registry.command_prompt(),
+        }
+    )
+)
+"""
+
+
+def register_commands(mode: str) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", REGISTER_COMMANDS, mode],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def benchmark_command_import(n_runs: int = 5):
+    """Compare importing every command module at startup with the lazy manifest"""
+    results = {
+        mode: [register_commands(mode) for _ in range(n_runs)]
+        for mode in ("eager", "lazy")
+    }
+
+    # The manifest must describe the same commands as the decorators
+    if results["eager"][0]["prompt"] != results["lazy"][0]["prompt"]:
+        print("The command manifest does not match the command modules:")
+        print(f"eager:\n{results['eager'][0]['prompt']}")
+        print(f"lazy:\n{results['lazy'][0]['prompt']}")
+        sys.exit(1)
+
+    print(f"Median time to register the commands over {n_runs} fresh interpreters:")
+    for mode, runs in results.items():
+        seconds = statistics.median(run["seconds"] for run in runs)
+        print(
+            f"{mode + ':':<7}{seconds * 1000:>9.1f}ms, "
+            f"{runs[0]['modules']} modules imported"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the import of the command modules at startup"
+    )
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    benchmark_command_import(n_runs=args.runs)
@@ -0,0 +1,80 @@
+import argparse
+import json
+import os
+import time
+
+from jsonschema import Draft7Validator
+
+from autollama.json_utils import utilities
+from autollama.json_utils.utilities import LLM_DEFAULT_RESPONSE_FORMAT, is_valid
+from autollama.memory.message_history import MessageHistory
+
+
+def make_reply(i: int) -> str:
+    return json.dumps(
+        {
+            "thoughts": {
+                "text": f"thought {i}",
+                "reasoning": "reasoning " * 20,
+                "plan": "- step one\n- step two\n- step three",
+                "criticism": "criticism " * 10,
+                "speak": f"I will run command {i}",
+            },
+            "command": {"name": "read_file", "args": {"filename": f"file_{i}.txt"}},
+        }
+    )
+
+
+def uncached_is_valid(json_string: str, schema_name: str) -> bool:
+    """Validation as it was done before: load the schema and build a validator per call"""
+    json_object = json.loads(json_string)
+    scheme_file = os.path.join(os.path.dirname(utilities.__file__), f"{schema_name}.json")
+    with open(scheme_file, "r") as f:
+        schema = json.load(f)
+    validator = Draft7Validator(schema)
+    errors = sorted(validator.iter_errors(json_object), key=lambda e: e.path)
+    return not errors
+
+
+def benchmark_json_validation(n_cycles: int = 200):
+    """Compare the cost of validating the message history on every agent cycle"""
+    replies = [make_reply(i) for i in range(n_cycles)]
+
+    # Before: every cycle re-validates the whole history, from the schema file
+    start = time.perf_counter()
+    for cycle in range(1, n_cycles + 1):
+        for reply in replies[:cycle]:
+            uncached_is_valid(reply, LLM_DEFAULT_RESPONSE_FORMAT)
+    uncached = (time.perf_counter() - start) / n_cycles
+
+    # Every cycle re-validates the whole history, with the cached validator
+    start = time.perf_counter()
+    for cycle in range(1, n_cycles + 1):
+        for reply in replies[:cycle]:
+            is_valid(json.loads(reply), LLM_DEFAULT_RESPONSE_FORMAT)
+    cached = (time.perf_counter() - start) / n_cycles
+
+    # After: the history's cycle index only validates the messages of the new cycle
+    history = MessageHistory(agent=None)
+    start = time.perf_counter()
+    for i, reply in enumerate(replies):
+        history.add("user", "Determine which next command to use")
+        history.add("assistant", reply, "ai_response")
+        history.add("system", f"Command read_file returned: {i}", "action_result")
+        assert len(history.cycles()) == i + 1
+    incremental = (time.perf_counter() - start) / n_cycles
+
+    print(f"Average validation cost per cycle over {n_cycles} cycles:")
+    print(f"uncached schema, full history:  {uncached * 1000:.3f}ms")
+    print(f"cached validator, full history: {cached * 1000:.3f}ms")
+    print(f"cached validator, cycle index:  {incremental * 1000:.3f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the validation of the message history per cycle"
+    )
+    parser.add_argument("--cycles", type=int, default=200)
+    args = parser.parse_args()
+
+    benchmark_json_validation(n_cycles=args.cycles)
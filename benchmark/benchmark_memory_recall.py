@@ -0,0 +1,111 @@
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from autollama.config import Config
+from autollama.memory.vector import IVFMemory, JSONFileMemory, MemoryItem
+
+
+def make_memories(n_memories: int, n_chunks: int, dimensions: int, rng):
+    """Generate memories with clustered random embeddings, like real documents"""
+    topics = rng.standard_normal((max(n_memories // 20, 1), dimensions))
+    for i in range(n_memories):
+        topic = topics[rng.integers(len(topics))]
+        vectors = topic + 0.5 * rng.standard_normal((n_chunks + 1, dimensions))
+        yield MemoryItem(
+            raw_content=f"memory {i}",
+            summary=f"summary {i}",
+            chunks=[f"chunk {j}" for j in range(n_chunks)],
+            chunk_summaries=[f"chunk summary {j}" for j in range(n_chunks)],
+            e_summary=vectors[0].tolist(),
+            e_chunks=[v.tolist() for v in vectors[1:]],
+            metadata={},
+        )
+
+
+def timed_search(search, queries, k: int):
+    results = []
+    start = time.perf_counter()
+    for q in queries:
+        results.append([r.memory_item.raw_content for r in search("query", k, q)])
+    elapsed = time.perf_counter() - start
+    return results, elapsed / len(queries)
+
+
+def benchmark_memory_recall(
+    n_memories: int = 5000,
+    n_chunks: int = 20,
+    dimensions: int = 300,
+    n_queries: int = 100,
+    k: int = 10,
+    n_probes: tuple[int, ...] = (1, 2, 4, 8, 16, 32),
+):
+    """Compare recall@k and latency of the IVF memory index to the exact search"""
+    rng = np.random.default_rng(42)
+    cfg = Config()
+
+    with tempfile.TemporaryDirectory() as workspace:
+        cfg.workspace_path = workspace
+        memory = IVFMemory(cfg)
+        memory.clear()
+
+        start = time.perf_counter()
+        for item in make_memories(n_memories, n_chunks, dimensions, rng):
+            memory.add(item)
+        print(
+            f"Added {n_memories} memories ({memory._n_rows} embeddings) "
+            f"in {time.perf_counter() - start:.2f}s"
+        )
+
+        start = time.perf_counter()
+        memory.train()
+        print(
+            f"Trained {len(memory._centroids)} lists "
+            f"in {time.perf_counter() - start:.2f}s"
+        )
+
+        queries = [
+            memory._matrix[row] + 0.5 * rng.standard_normal(dimensions)
+            for row in rng.integers(memory._n_rows, size=n_queries)
+        ]
+
+        exact_search = lambda query, k, e_query: JSONFileMemory.get_relevant(
+            memory, query, k, e_query
+        )
+        exact, exact_latency = timed_search(exact_search, queries, k)
+        print(f"exact     recall@{k}: 1.000  latency: {exact_latency * 1000:.2f}ms")
+
+        for n_probe in n_probes:
+            memory.n_probe = n_probe
+            approx, latency = timed_search(memory.get_relevant, queries, k)
+            recall = np.mean(
+                [len(set(a) & set(e)) / len(e) for a, e in zip(approx, exact)]
+            )
+            print(
+                f"n_probe={n_probe:<3} recall@{k}: {recall:.3f}  "
+                f"latency: {latency * 1000:.2f}ms"
+            )
+
+        memory.clear()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark recall and latency of the IVF memory backend"
+    )
+    parser.add_argument("--memories", type=int, default=5000)
+    parser.add_argument("--chunks", type=int, default=20)
+    parser.add_argument("--dimensions", type=int, default=300)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("-k", type=int, default=10)
+    args = parser.parse_args()
+
+    benchmark_memory_recall(
+        n_memories=args.memories,
+        n_chunks=args.chunks,
+        dimensions=args.dimensions,
+        n_queries=args.queries,
+        k=args.k,
+    )
@@ -0,0 +1,204 @@
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+RESULT_PREFIX = "STARTUP_BENCHMARK "
+
+# Starts the CLI as `python -m autollama` does, and exits as soon as it asks the
+# user for input, reporting when that happened and the peak RSS so far
+STARTUP = f"""
+import builtins
+import json
+import os
+import resource
+import sys
+import time
+
+
+def first_prompt(prompt=""):
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        peak_rss /= 1024
+    result = {{"prompted_at": time.time(), "peak_rss_kb": peak_rss}}
+    sys.stdout.write("\\n{RESULT_PREFIX}" + json.dumps(result) + "\\n")
+    sys.stdout.flush()
+    os._exit(0)
+
+
+builtins.input = first_prompt
+sys.argv[0] = "autollama"
+
+import autollama.cli
+
+autollama.cli.main()
+"""
+
+# "import time:       self [us] |  cumulative | imported package"
+IMPORT_TIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| +(\S+)$")
+
+DEFAULT_MODULE_BUDGETS = ["autollama=150", "autollama.cli=250", "autollama.main=2500"]
+
+
+def start_autollama(workspace: str, python_options: list[str] = ()) -> tuple[dict, str]:
+    """Starts Auto-Llama up to its first prompt, returns its result and its stderr"""
+    env = dict(os.environ, PYTHONPATH=str(REPO_ROOT))
+    # The API key is only checked for presence before the first prompt
+    env.setdefault("GROQ_API_KEY", "startup-benchmark")
+    started_at = time.time()
+    process = subprocess.run(
+        [sys.executable, *python_options, "-c", STARTUP, "-w", workspace],
+        capture_output=True,
+        cwd=REPO_ROOT,
+        env=env,
+        stdin=subprocess.DEVNULL,
+        text=True,
+        timeout=300,
+    )
+    for line in process.stdout.splitlines():
+        if line.startswith(RESULT_PREFIX):
+            result = json.loads(line.removeprefix(RESULT_PREFIX))
+            result["first_prompt"] = result["prompted_at"] - started_at
+            return result, process.stderr
+    raise RuntimeError(
+        f"Auto-Llama exited with code {process.returncode} before its first prompt:\n"
+        f"{process.stdout}\n{process.stderr}"
+    )
+
+
+def parse_import_times(stderr: str) -> dict[str, dict[str, float]]:
+    """Gets the self and cumulative import time of each module, in milliseconds"""
+    import_times = {}
+    for line in stderr.splitlines():
+        if match := IMPORT_TIME_LINE.match(line):
+            self_us, cumulative_us, module = match.groups()
+            import_times[module] = {
+                "self": int(self_us) / 1000,
+                "cumulative": int(cumulative_us) / 1000,
+            }
+    return import_times
+
+
+def parse_budgets(budgets: list[str]) -> dict[str, float]:
+    parsed = {}
+    for budget in budgets:
+        module, _, milliseconds = budget.partition("=")
+        parsed[module] = float(milliseconds)
+    return parsed
+
+
+def benchmark_startup(
+    n_runs: int,
+    max_first_prompt: float,
+    max_peak_rss: float,
+    max_import_time: float,
+    module_budgets: dict[str, float],
+    top: int,
+) -> bool:
+    """Measure the startup of Auto-Llama, returns whether it is within the budgets"""
+    with tempfile.TemporaryDirectory() as workspace:
+        runs = [start_autollama(workspace)[0] for _ in range(n_runs)]
+        _, stderr = start_autollama(workspace, ["-X", "importtime"])
+    import_times = parse_import_times(stderr)
+
+    first_prompt = statistics.median(run["first_prompt"] for run in runs)
+    peak_rss = statistics.median(run["peak_rss_kb"] for run in runs) / 1024
+    total_import_time = sum(times["self"] for times in import_times.values())
+
+    print(f"Median startup over {n_runs} runs:")
+    print(f"time to first prompt: {first_prompt:>9.2f}s")
+    print(f"peak RSS:             {peak_rss:>9.1f}MB")
+    print(f"import time:          {total_import_time:>9.1f}ms")
+
+    # Cost of each package, whichever module ended up importing it
+    packages: dict[str, float] = {}
+    for module, times in import_times.items():
+        package = module.split(".")[0]
+        packages[package] = packages.get(package, 0.0) + times["self"]
+    slowest = sorted(packages.items(), key=lambda item: -item[1])[:top]
+    print(f"\nSlowest packages to import, of {len(packages)}:")
+    for package, milliseconds in slowest:
+        print(f"{package:<40}{milliseconds:>9.1f}ms")
+
+    failures = []
+    if first_prompt > max_first_prompt:
+        failures.append(
+            f"time to first prompt {first_prompt:.2f}s > {max_first_prompt:.2f}s"
+        )
+    if peak_rss > max_peak_rss:
+        failures.append(f"peak RSS {peak_rss:.1f}MB > {max_peak_rss:.1f}MB")
+    if total_import_time > max_import_time:
+        failures.append(
+            f"import time {total_import_time:.1f}ms > {max_import_time:.1f}ms"
+        )
+
+    print("\nCumulative import time of the budgeted modules:")
+    for module, budget in module_budgets.items():
+        if module not in import_times:
+            print(f"{module:<40}{'not imported':>11}")
+            continue
+        cumulative = import_times[module]["cumulative"]
+        print(f"{module:<40}{cumulative:>9.1f}ms / {budget:.0f}ms")
+        if cumulative > budget:
+            failures.append(f"import of {module} {cumulative:.1f}ms > {budget:.0f}ms")
+
+    if failures:
+        print("\nStartup budget exceeded:")
+        for failure in failures:
+            print(f"- {failure}")
+        return False
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the startup of Auto-Llama, up to its first prompt, "
+        "and fail if it exceeds its budget"
+    )
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument(
+        "--max-first-prompt",
+        type=float,
+        default=5.0,
+        help="Budget for the time to the first prompt, in seconds",
+    )
+    parser.add_argument(
+        "--max-peak-rss",
+        type=float,
+        default=400.0,
+        help="Budget for the peak RSS before the first prompt, in MB",
+    )
+    parser.add_argument(
+        "--max-import-time",
+        type=float,
+        default=3000.0,
+        help="Budget for the total import time, in milliseconds",
+    )
+    parser.add_argument(
+        "--module-budget",
+        action="append",
+        metavar="MODULE=MS",
+        help="Budget for the cumulative import time of a module, in milliseconds; "
+        f"may be repeated (Default: {' '.join(DEFAULT_MODULE_BUDGETS)})",
+    )
+    parser.add_argument(
+        "--top", type=int, default=15, help="Number of slowest packages to show"
+    )
+    args = parser.parse_args()
+
+    within_budget = benchmark_startup(
+        n_runs=args.runs,
+        max_first_prompt=args.max_first_prompt,
+        max_peak_rss=args.max_peak_rss,
+        max_import_time=args.max_import_time,
+        module_budgets=parse_budgets(args.module_budget or DEFAULT_MODULE_BUDGETS),
+        top=args.top,
+    )
+    sys.exit(0 if within_budget else 1)
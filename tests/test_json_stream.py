@@ -0,0 +1,26 @@
+import time
+import unittest
+
+from autollama.json_utils.json_stream import JSONStreamParser
+
+
+class TestJSONStreamParser(unittest.TestCase):
+    def test_stray_closers_in_deep_nesting_parse_in_linear_time(self):
+        # Every ']' closes nothing, and used to scan the whole stack of open objects
+        depth = 20000
+        reply = '{"a":' * depth + "]" * depth
+
+        start = time.perf_counter()
+        parser = JSONStreamParser()
+        parser.feed(reply)
+        value = parser.finish()
+        elapsed = time.perf_counter() - start
+
+        self.assertLess(elapsed, 2.0)
+        self.assertIsInstance(value, dict)
+        # Each stray closer and each object left open is a repair
+        self.assertGreaterEqual(parser.repairs, 2 * depth)
+
+
+if __name__ == "__main__":
+    unittest.main()